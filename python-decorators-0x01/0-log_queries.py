@@ -1,13 +1,27 @@
-from datetime import datetime
 import sqlite3
 import functools
+import time
+
+import query_log
+
+# events are queued here and written in batches by a background thread
+query_events = query_log.from_env()
 
 def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         query = kwargs.get("query") or (args[0] if args else None)
-        print(f"[{datetime.now()}] [LOG] Executing query: {query}")
-        return func(*args, **kwargs)
+        params = args[1:] if args and query is args[0] else args
+        params += tuple(value for key, value in kwargs.items() if key != "query")
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            query_events.record(query, params, time.perf_counter() - started,
+                                error=type(e).__name__)
+            raise
+        query_events.record(query, params, time.perf_counter() - started, result)
+        return result
     return wrapper
 
 
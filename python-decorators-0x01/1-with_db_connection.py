@@ -1,14 +1,13 @@
-import sqlite3
 import functools
 
+import connection_pool
+
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn=sqlite3.connect('users.db')
-        try:
+        # borrow a warm connection instead of opening one per call
+        with connection_pool.connection('users.db') as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
@@ -1,18 +1,17 @@
-import sqlite3
 import functools
 
+import connection_pool
+import result_cache
 
 
-#decorator to open & close DB connection
+
+#decorator to borrow a pooled DB connection & hand it back
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn= sqlite3.connect('users.db')
-        try:
+        with connection_pool.connection('users.db') as conn:
             result=func(conn, *args, **kwargs)
             return result
-        finally:
-            conn.close()
     return wrapper
 
 #decorator to manage transactions
@@ -20,8 +19,10 @@ def transactional(func):
     @functools.wraps(func)
     def wrapper(conn,*args, **kwargs):
         try:
-            result = func(conn, *args, **kwargs)
+            with result_cache.track_writes(conn) as written:
+                result = func(conn, *args, **kwargs)
             conn.commit()   #commit is no error
+            result_cache.invalidate_tables(written) #drop cached reads of written tables
             return result
         except Exception as e:
             conn.rollback() #rollback if error occurs
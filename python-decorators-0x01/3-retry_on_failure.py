@@ -1,17 +1,15 @@
-import sqlite3
 import functools
 import time
 
-# Decorator to open & close DB connection
+import connection_pool
+
+# Decorator to borrow a pooled DB connection & hand it back
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with connection_pool.connection('users.db') as conn:
             result = func(conn, *args, **kwargs)
             return result
-        finally:
-            conn.close()
     return wrapper
 
 
@@ -1,35 +1,50 @@
 import time
-import sqlite3
 import functools
+import inspect
 
-query_cache = {}
+import connection_pool
+import disk_cache
+import result_cache
+
+# bounded LRU of query results with TTLs, invalidated by transactional writes;
+# set QUERY_CACHE_PATH to back it with a cache file shared between processes
+query_cache = result_cache.QueryCache(disk=disk_cache.from_env())
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn= sqlite3.connect('users.db')
-        try:
+        with connection_pool.connection('users.db') as conn:
             result= func(conn, *args, **kwargs)
             return result
-        finally:
-            conn.close()
     return wrapper
 
 
 
-def cache_query(func):
+def cache_query(func=None, *, ttl=None, cache=query_cache):
+    """Cache the results of func(conn, query, ...) by query and parameters.
+
+    Use bare (@cache_query) or with options (@cache_query(ttl=60)). The key
+    is the normalised query plus every other argument except the
+    connection, and entries are dropped when a transactional write touches
+    a table the query reads (see result_cache.py). Pass
+    cache=result_cache.QueryCache(stale_ttl=...) to serve expired results
+    while a single caller refreshes them.
+    """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, cache=cache)
+    signature = inspect.signature(func)
+    conn_param = next(iter(signature.parameters))
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get('query')
-        print(f"[CACHE BEFORE] {query_cache}")
-        if query in query_cache:
-            print(f"[CACHE HIT] Returning cached result for: {query}")
-            print("Current cache:", query_cache)
-            return query_cache[query]
-        
-        print(f"[CACHE MISS] Executing and caching result for: {query}")
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        return result
+        arguments = dict(signature.bind(*args, **kwargs).arguments)
+        del arguments[conn_param]
+        query = arguments.pop('query', None)
+        if query is None:
+            return func(*args, **kwargs)
+        key = result_cache.make_key(query, arguments)
+        # concurrent callers missing on the same key share one query
+        return cache.get_or_load(key, lambda: func(*args, **kwargs),
+                                 result_cache.read_tables(query), ttl)
     return wrapper
 
 
@@ -47,4 +62,6 @@ users = fetch_users_with_cache(query="SELECT * FROM users")
 
 ### Second call will use the cached result
 
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
+users_again = fetch_users_with_cache(query="SELECT * FROM users")
+
+print(query_cache.stats())
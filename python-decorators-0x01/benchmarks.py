@@ -0,0 +1,299 @@
+#!/usr/bin/python3
+"""
+Benchmarks for the database decorators, against a throwaway users.db.
+
+    python benchmarks.py connections            # pooled vs open-per-call
+    python benchmarks.py connections --threads 8
+    python benchmarks.py cache                  # bounded query-result cache
+    python benchmarks.py stampede --calls 20 --threads 32  # burst misses on one key
+    python benchmarks.py disk --calls 2000      # cold worker: query vs disk tier
+    python benchmarks.py logging --threads 8    # print per query vs QueryLog
+"""
+import argparse
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import connection_pool
+import disk_cache
+import query_log
+import result_cache
+
+
+def create_users_db(path, rows=10_000):
+    """Create a users table with `rows` rows at `path`."""
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS users "
+                     "(id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                         ((f"User {i}", f"user{i}@example.com", 18 + i % 60)
+                          for i in range(rows)))
+    conn.close()
+
+
+def _timed(label, run, calls):
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    rate = calls / elapsed if elapsed else float("inf")
+    print(f"{label:<16} {calls:>8} calls  {elapsed:8.3f}s  {rate:>12,.0f} calls/s")
+    return calls, elapsed
+
+
+def _in_threads(threads, calls, call):
+    """Make `calls` calls of call(i), spread over `threads` threads."""
+    def work(offset):
+        for i in range(offset, calls, threads):
+            call(i)
+
+    def run():
+        workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    return run
+
+
+def bench_connections(calls=20_000, threads=1, rows=10_000):
+    """A get_user_by_id lookup through open-per-call and pooled with_db_connection."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        create_users_db(path, rows)
+
+        def per_call(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                conn = sqlite3.connect(path)
+                try:
+                    return func(conn, *args, **kwargs)
+                finally:
+                    conn.close()
+            return wrapper
+
+        def pooled(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with connection_pool.connection(path) as conn:
+                    return func(conn, *args, **kwargs)
+            return wrapper
+
+        def get_user_by_id(conn, user_id):
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM users WHERE id=?", (user_id,))
+            return cursor.fetchone()
+
+        lookups = {"open-per-call": per_call(get_user_by_id),
+                   "pooled": pooled(get_user_by_id)}
+        results = {}
+        for label, lookup in lookups.items():
+            run = _in_threads(threads, calls, lambda i, f=lookup: f(i % rows + 1))
+            results[label] = _timed(label, run, calls)
+        stats = connection_pool.get_pool(path).stats()
+        print("pool:", ", ".join(f"{key}={value}" for key, value in stats.items()))
+        connection_pool.get_pool(path).close()
+        return results
+
+
+def bench_cache(calls=20_000, threads=1, rows=10_000, writes_every=1000):
+    """Repeated age-range queries uncached and through a bounded QueryCache.
+
+    Every `writes_every` calls an UPDATE goes through track_writes, so the
+    cached run also pays for table invalidation.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        create_users_db(path, rows)
+        cache = result_cache.QueryCache(max_entries=128)
+        query = "SELECT * FROM users WHERE age = ?"
+
+        def uncached(age):
+            with connection_pool.connection(path) as conn:
+                return conn.execute(query, (age,)).fetchall()
+
+        def cached(age):
+            return cache.get_or_load(result_cache.make_key(query, (age,)),
+                                     lambda: uncached(age), result_cache.read_tables(query))
+
+        def call(lookup):
+            def run(i):
+                if i % writes_every == 0:
+                    with connection_pool.connection(path) as conn:
+                        with result_cache.track_writes(conn) as written:
+                            conn.execute("UPDATE users SET age = age WHERE id = 1")
+                        conn.commit()
+                    result_cache.invalidate_tables(written)
+                return lookup(18 + i % 60)
+            return run
+
+        results = {
+            "uncached": _timed("uncached", _in_threads(threads, calls, call(uncached)), calls),
+            "cached": _timed("cached", _in_threads(threads, calls, call(cached)), calls),
+        }
+        print("cache:", ", ".join(f"{key}={value}" for key, value in cache.stats().items()))
+        connection_pool.get_pool(path).close()
+        return results
+
+
+def bench_stampede(calls=20, threads=32, rows=10_000):
+    """Bursts of `threads` callers missing on the same key at the same moment.
+
+    Compares get()/put() (every caller runs the query) with get_or_load()
+    (one caller runs it, the others wait for its result). `calls` is the
+    number of bursts; the cache is cleared before each one.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        create_users_db(path, rows)
+        query = "SELECT * FROM users WHERE age = ?"
+        key = result_cache.make_key(query, (30,))
+        tables = result_cache.read_tables(query)
+        queries = [0]
+        lock = threading.Lock()
+
+        def load():
+            with lock:
+                queries[0] += 1
+            with connection_pool.connection(path) as conn:
+                return conn.execute(query, (30,)).fetchall()
+
+        def check_then_load(cache):
+            hit, result = cache.get(key)
+            if not hit:
+                result = load()
+                cache.put(key, result, tables)
+            return result
+
+        def single_flight(cache):
+            return cache.get_or_load(key, load, tables)
+
+        results = {}
+        for label, lookup in (("get/put", check_then_load), ("single-flight", single_flight)):
+            cache = result_cache.QueryCache()
+            queries[0] = 0
+
+            def burst():
+                cache.clear()
+                start = threading.Barrier(threads)
+
+                def caller():
+                    start.wait()
+                    lookup(cache)
+                workers = [threading.Thread(target=caller) for _ in range(threads)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+
+            results[label] = _timed(label, lambda: [burst() for _ in range(calls)],
+                                    calls * threads)
+            print(f"{'':<16} {queries[0] / calls:8.1f} queries per burst of {threads}")
+        connection_pool.get_pool(path).close()
+        return results
+
+
+def bench_disk(calls=2_000, threads=1, rows=10_000):
+    """A cold worker's lookups: run the query versus read the disk tier.
+
+    A first QueryCache warms a DiskCache with one result per age; each
+    measured call then uses a fresh, empty memory tier, as a newly started
+    process would.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "users.db")
+        create_users_db(path, rows)
+        disk = disk_cache.DiskCache(os.path.join(tmp, "query_cache.db"))
+        query = "SELECT * FROM users WHERE age = ?"
+        tables = result_cache.read_tables(query)
+
+        def run_query(age):
+            with connection_pool.connection(path) as conn:
+                return conn.execute(query, (age,)).fetchall()
+
+        def from_disk(age):
+            cold = result_cache.QueryCache(disk=disk)
+            return cold.get_or_load(result_cache.make_key(query, (age,)),
+                                    lambda: run_query(age), tables)
+
+        for age in range(18, 78):
+            from_disk(age)
+        results = {
+            "query": _timed("query", _in_threads(threads, calls,
+                                                 lambda i: run_query(18 + i % 60)), calls),
+            "disk tier": _timed("disk tier", _in_threads(threads, calls,
+                                                         lambda i: from_disk(18 + i % 60)), calls),
+        }
+        print("disk:", ", ".join(f"{key}={value}" for key, value in disk.stats().items()))
+        connection_pool.get_pool(path).close()
+        connection_pool.get_pool(disk.path).close()
+        return results
+
+
+def bench_logging(calls=20_000, threads=1, rows=10_000):
+    """A logged get_user_by_id: print before every query vs a QueryLog.
+
+    Both write to os.devnull. The timings are what the query path pays;
+    writing out what is still queued at the end is timed separately.
+    """
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as sink:
+        path = os.path.join(tmp, "users.db")
+        create_users_db(path, rows)
+        query = "SELECT * FROM users WHERE id = ?"
+        log = query_log.QueryLog(sink)
+        print_lock = threading.Lock()
+
+        def run_query(user_id):
+            with connection_pool.connection(path) as conn:
+                return conn.execute(query, (user_id,)).fetchall()
+
+        def printed(i):
+            with print_lock:  # what print() to a shared stream serialises on
+                print(f"[{datetime.now()}] [LOG] Executing query: {query}", file=sink,
+                      flush=True)
+            return run_query(i % rows + 1)
+
+        def queued(i):
+            started = time.perf_counter()
+            result = run_query(i % rows + 1)
+            log.record(query, (i % rows + 1,), time.perf_counter() - started, result)
+            return result
+
+        results = {
+            "print": _timed("print", _in_threads(threads, calls, printed), calls),
+            "query log": _timed("query log", _in_threads(threads, calls, queued), calls),
+        }
+        started = time.perf_counter()
+        log.flush()
+        print(f"{'':<16} final flush {time.perf_counter() - started:.3f}s")
+        print("log:", ", ".join(f"{key}={value}" for key, value in log.stats().items()))
+        connection_pool.get_pool(path).close()
+        return results
+
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "cache": bench_cache,
+    "stampede": bench_stampede,
+    "disk": bench_disk,
+    "logging": bench_logging,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--rows", type=int, default=10_000,
+                        help="users in the throwaway database")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](calls=args.calls, threads=args.threads, rows=args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Pool of warm sqlite3 connections behind with_db_connection.
+
+Opening a connection per call means re-reading the schema and starting
+with a cold page cache every time. The pool keeps up to `max_size` open
+connections per database path (and per process); a thread gets back the
+idle connection it used last when there is one, so its cache stays warm.
+
+    with connection_pool.connection('users.db') as conn:
+        conn.execute(...)
+
+Connections are reset when they come back: an open transaction is rolled
+back and isolation_level / row_factory / text_factory are restored. stats() reports hits
+(an idle connection was reused), misses (a new one was opened) and waits
+(the pool was exhausted and the caller had to wait).
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+TIMEOUT = 30.0
+
+
+class SQLitePool:
+    """Bounded, thread-safe pool of connections to one SQLite file."""
+
+    def __init__(self, path, max_size=POOL_SIZE, timeout=TIMEOUT):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []  # (connection, id of the thread that used it last)
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {"hits": 0, "misses": 0, "waits": 0, "discarded": 0}
+
+    def _connect(self):
+        # handed between threads, but only ever used by one at a time
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def _take_idle(self):
+        me = threading.get_ident()
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._idle[index][1] == me:
+                return self._idle.pop(index)[0]
+        return self._idle.pop()[0]
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError(f"Connection pool for {self.path} is closed")
+
+    def acquire(self):
+        """Return a connection, waiting up to `timeout` seconds for a free one."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._check_open()
+            if not self._idle and self._open >= self.max_size:
+                self._counters["waits"] += 1
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free connection to {self.path} "
+                                           f"after {self.timeout}s")
+                    self._cond.wait(remaining)
+                    self._check_open()
+            if self._idle:
+                self._counters["hits"] += 1
+                return self._take_idle()
+            self._open += 1
+            self._counters["misses"] += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _reset(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if conn.isolation_level != "":
+            conn.isolation_level = ""  # sqlite3's default: implicit BEGIN
+        conn.row_factory = None
+        conn.text_factory = str
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is unusable."""
+        if self._closed:
+            discard = True
+        if not discard:
+            try:
+                self._reset(conn)
+            except sqlite3.Error:
+                discard = True
+        if discard:
+            conn.close()
+            with self._cond:
+                self._open -= 1
+                self._counters["discarded"] += 1
+                self._cond.notify()
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, threading.get_ident()))
+                self._cond.notify()
+                return
+        self.release(conn, discard=True)  # closed while we were resetting it
+
+    def close(self):
+        """Close every idle connection; connections in use close on release.
+
+        acquire() on a closed pool raises RuntimeError.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, open=self._open, idle=len(self._idle),
+                        max_size=self.max_size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path):
+    """Return this process's pool for the database file at `path`."""
+    key = (os.getpid(), os.path.abspath(path))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = SQLitePool(path)
+        return pool
+
+
+@contextlib.contextmanager
+def connection(path):
+    """Borrow a pooled connection to `path` for the duration of a with block."""
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
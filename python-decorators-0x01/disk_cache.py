@@ -0,0 +1,248 @@
+"""
+Persistent second-level tier for QueryCache, stored in a SQLite file.
+
+A worker that starts cold, or a second process such as another gunicorn
+worker, finds results cached by the others in the file instead of running
+the query again:
+
+    cache = QueryCache(disk=DiskCache("query_cache.db"))
+
+Query results (lists of row tuples) are stored with marshal, which is
+compact and fast for tuples of ints, floats, strings, bytes and None, and
+compressed with zlib when they are large. Results marshal cannot encode
+are simply kept in memory only. The file is bounded by `max_bytes` of
+stored values and `max_entries`; expired entries go first, then the least
+recently used. Invalidation removes the entries that read a written table
+and bumps a generation counter, so a load that overlapped a write in any
+process is not stored.
+
+The disk tier never fails a query: SQLite errors are counted in stats()
+and treated as misses.
+"""
+import hashlib
+import marshal
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import connection_pool
+
+MAX_BYTES = 256 * 1024 * 1024
+MAX_ENTRIES = 100_000
+TTL = 3600.0
+COMPRESS_OVER = 4096  # bytes; smaller values are stored as is
+TOUCH_EVERY = 10.0  # seconds between access-time updates of an entry
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key BLOB PRIMARY KEY,
+        value BLOB NOT NULL,
+        compressed INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+    CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+    CREATE TABLE IF NOT EXISTS deps (
+        tbl TEXT NOT NULL,
+        key BLOB NOT NULL,
+        PRIMARY KEY (tbl, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS deps_key ON deps (key);
+    CREATE TABLE IF NOT EXISTS meta (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        generation INTEGER NOT NULL,
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO meta VALUES (0, 0, 0, 0);
+    CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries BEGIN
+        UPDATE meta SET entries = entries + 1, bytes = bytes + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries BEGIN
+        UPDATE meta SET entries = entries - 1, bytes = bytes - OLD.size;
+        DELETE FROM deps WHERE key = OLD.key;
+    END;
+"""
+
+COUNTERS = ("hits", "misses", "writes", "skipped", "evictions", "expirations",
+            "invalidations", "errors")
+
+
+def _canonical(value):
+    """A form of a cache key whose repr() is the same in every process."""
+    if isinstance(value, tuple):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, frozenset):
+        return ("frozenset", tuple(sorted((_canonical(item) for item in value), key=repr)))
+    return value
+
+
+def key_digest(key):
+    """16-byte digest of a result_cache key, stable across processes."""
+    return hashlib.blake2b(repr(_canonical(key)).encode("utf-8"), digest_size=16).digest()
+
+
+def encode(value):
+    """Return (blob, compressed) for a query result; raises ValueError if unsupported."""
+    blob = marshal.dumps(value)
+    if len(blob) > COMPRESS_OVER:
+        return zlib.compress(blob, 1), 1
+    return blob, 0
+
+
+def decode(blob, compressed):
+    return marshal.loads(zlib.decompress(blob) if compressed else blob)
+
+
+class DiskCache:
+    """Size-bounded SQLite store of query results shared between processes."""
+
+    def __init__(self, path="query_cache.db", max_bytes=MAX_BYTES,
+                 max_entries=MAX_ENTRIES, ttl=TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        return connection_pool.connection(self.path)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key):
+        """Return (True, value, seconds left) for a live entry, else (False, None, 0)."""
+        digest = key_digest(key)
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT value, compressed, expires_at, accessed_at "
+                                   "FROM entries WHERE key = ?", (digest,)).fetchone()
+                if row is None or row[2] <= now:
+                    self._count("misses")
+                    return False, None, 0
+                value = decode(row[0], row[1])
+                if now - row[3] >= TOUCH_EVERY:
+                    # recency only matters at eviction; don't write on every hit
+                    with conn:
+                        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                     (now, digest))
+        except (sqlite3.Error, ValueError, EOFError, zlib.error):
+            self._count("errors")
+            return False, None, 0
+        self._count("hits")
+        return True, value, row[2] - now
+
+    def generation(self):
+        """Current invalidation generation; pass it to put() as `since`.
+
+        Returns None if it cannot be read; don't store a load then, as an
+        invalidation that overlapped it would go unnoticed.
+        """
+        try:
+            with self._connection() as conn:
+                return conn.execute("SELECT generation FROM meta").fetchone()[0]
+        except sqlite3.Error:
+            self._count("errors")
+            return None
+
+    def put(self, key, value, tables, ttl=None, since=None):
+        """Store `value` unless a table was invalidated since generation `since`."""
+        try:
+            blob, compressed = encode(value)
+        except ValueError:
+            self._count("skipped")  # not marshal-able: memory tier only
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or len(blob) > self.max_bytes:
+            self._count("skipped")
+            return
+        digest = key_digest(key)
+        now = time.time()
+        try:
+            with self._connection() as conn, conn:
+                # take the write lock first, so no invalidation can slip in
+                # between the generation check and the insert
+                conn.execute("BEGIN IMMEDIATE")
+                if since is not None:
+                    current = conn.execute("SELECT generation FROM meta").fetchone()[0]
+                    if current != since:
+                        self._count("skipped")
+                        return
+                conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+                conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                             (digest, blob, compressed, len(blob), now + ttl, now))
+                conn.executemany("INSERT OR IGNORE INTO deps VALUES (?, ?)",
+                                 [(table, digest) for table in tables])
+                self._evict(conn, now)
+        except sqlite3.Error:
+            self._count("errors")
+            return
+        self._count("writes")
+
+    def _evict(self, conn, now):
+        entries, size = conn.execute("SELECT entries, bytes FROM meta").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        expired = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+        self._count("expirations", expired)
+        while True:
+            entries, size = conn.execute("SELECT entries, bytes FROM meta").fetchone()
+            if entries <= self.max_entries and size <= self.max_bytes:
+                return
+            # drop a tenth at a time so a full file doesn't evict on every put
+            batch = max(1, entries // 10, entries - self.max_entries)
+            evicted = conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)", (batch,)).rowcount
+            self._count("evictions", evicted)
+
+    def invalidate_tables(self, tables):
+        """Drop entries reading any of `tables` and bump the generation."""
+        tables = list(tables) + ["*"]
+        marks = ", ".join("?" * len(tables))
+        try:
+            with self._connection() as conn, conn:
+                conn.execute("UPDATE meta SET generation = generation + 1")
+                dropped = conn.execute(
+                    f"DELETE FROM entries WHERE key IN "
+                    f"(SELECT key FROM deps WHERE tbl IN ({marks}))", tables).rowcount
+        except sqlite3.Error:
+            self._count("errors")
+            return 0
+        self._count("invalidations", dropped)
+        return dropped
+
+    def clear(self):
+        try:
+            with self._connection() as conn, conn:
+                conn.execute("DELETE FROM entries")
+        except sqlite3.Error:
+            self._count("errors")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        try:
+            with self._connection() as conn:
+                entries, size = conn.execute("SELECT entries, bytes FROM meta").fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        return dict(counters, entries=entries, bytes=size, max_entries=self.max_entries,
+                    max_bytes=self.max_bytes)
+
+
+def from_env():
+    """A DiskCache at $QUERY_CACHE_PATH, or None when the variable is unset."""
+    path = os.getenv("QUERY_CACHE_PATH")
+    return DiskCache(path) if path else None
@@ -0,0 +1,167 @@
+"""
+Asynchronous, batched query log for log_queries.
+
+record() is all the query path pays: it samples, hashes the parameters
+and appends one small tuple to a bounded ring buffer (a deque, whose append
+and popleft are atomic, so no lock is taken). A daemon thread wakes every
+`flush_interval` seconds, drains the buffer, fingerprints the SQL and
+writes the events as JSON lines with one write() per batch:
+
+    {"ts": "2026-10-18T09:30:01.123456", "fingerprint": "select * from users
+     where id = ?", "params": "5d41402abc4b2a76", "ms": 0.21, "rows": 1,
+     "error": null}
+
+The fingerprint is the SQL with literals replaced by "?" and whitespace and
+case normalised, so one statement shape gives one fingerprint. Memory is
+capped: at most `capacity` events are held, each with at most MAX_SQL
+characters of SQL and a 16-character digest of the parameters (so later
+changes to the caller's parameters do not show in the log), and events
+that arrive while the buffer is full are dropped and counted rather than
+waited for. With `sample_rate` below 1 only that fraction of queries is
+logged, except queries slower than `always_over_ms`, which are always kept.
+
+Counters in stats() are updated without locks and may be slightly low
+under heavy concurrency.
+"""
+import atexit
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from result_cache import normalise_sql
+
+CAPACITY = 10_000
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 0.1
+MAX_SQL = 2048
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_LINE = ('{"ts": "%s", "fingerprint": %s, "params": %s, "ms": %.3f, "rows": %s, '
+         '"error": %s}\n')
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """The statement shape of `sql`: literals become "?", IN lists collapse."""
+    shape = _NUMBER.sub("?", _STRING.sub("?", sql))
+    return _IN_LIST.sub("(?)", normalise_sql(shape))
+
+
+@functools.lru_cache(maxsize=1024)
+def _fingerprint_json(sql):
+    return json.dumps(fingerprint(sql) if isinstance(sql, str) else sql)
+
+
+def params_hash(params):
+    """Short stable digest of bound parameters, or None without any."""
+    if not params:
+        return None
+    return hashlib.blake2b(repr(params).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class QueryLog:
+    """Ring buffer of query events drained by a background writer thread."""
+
+    def __init__(self, stream=None, capacity=CAPACITY, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, sample_rate=1.0, always_over_ms=None):
+        self.stream = stream
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.always_over_ms = always_over_ms
+        self._events = deque(maxlen=capacity)
+        self._flush_lock = threading.Lock()  # writer side only
+        self._start_lock = threading.Lock()
+        self._pid = None  # process the writer thread runs in
+        self._counters = {"recorded": 0, "written": 0, "dropped": 0, "sampled_out": 0}
+        atexit.register(self.flush)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # the parent's writer may have held a lock at the fork, and the
+        # queued events are the parent's to write
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._events.clear()
+
+    def _start(self):
+        """Start the writer thread unless it already runs in this process."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="query-log-writer", daemon=True).start()
+
+    def _run(self):
+        pid = self._pid
+        while self._pid == pid:
+            # keep draining while a burst has the buffer over half full
+            if len(self._events) < self.capacity // 2:
+                time.sleep(self.flush_interval)
+            self.flush()
+
+    def record(self, sql, params, seconds, result=None, error=None):
+        """Queue one query event; never blocks and never raises on a full buffer."""
+        counters = self._counters
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate and (
+                self.always_over_ms is None or seconds * 1000 < self.always_over_ms):
+            counters["sampled_out"] += 1
+            return
+        if len(self._events) >= self.capacity:
+            counters["dropped"] += 1
+            return
+        if self._pid != os.getpid():
+            self._start()
+        if isinstance(sql, str) and len(sql) > MAX_SQL:
+            sql = sql[:MAX_SQL]
+        rows = len(result) if isinstance(result, (list, tuple)) else None
+        self._events.append((time.time(), sql, params_hash(params), seconds, rows, error))
+        counters["recorded"] += 1
+
+    def flush(self):
+        """Write out the queued events, in batches of `batch_size`."""
+        with self._flush_lock:
+            for _ in range(-(-len(self._events) // self.batch_size)):
+                batch = []
+                try:
+                    for _ in range(self.batch_size):
+                        batch.append(self._events.popleft())
+                except IndexError:
+                    pass
+                self._write(batch)
+
+    def _write(self, batch):
+        lines = []
+        for ts, sql, digest, seconds, rows, error in batch:
+            lines.append(_LINE % (
+                datetime.fromtimestamp(ts).isoformat(), _fingerprint_json(sql),
+                json.dumps(digest), seconds * 1000, json.dumps(rows),
+                json.dumps(error)))
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+        except (OSError, ValueError):  # closed or broken stream at shutdown
+            return
+        self._counters["written"] += len(batch)
+
+    def stats(self):
+        return dict(self._counters, pending=len(self._events), capacity=self.capacity)
+
+
+def from_env():
+    """A QueryLog writing to $QUERY_LOG_PATH (appending), or to stdout."""
+    path = os.getenv("QUERY_LOG_PATH")
+    stream = open(path, "a", encoding="utf-8", buffering=1 << 16) if path else None
+    return QueryLog(stream, sample_rate=float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0")))
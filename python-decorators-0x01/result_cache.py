@@ -0,0 +1,386 @@
+"""
+Bounded query-result cache for cache_query.
+
+Entries are keyed on the normalised SQL text plus the bound parameters,
+so "SELECT * FROM users" and "select  *\nFROM users;" share an entry while
+the same SQL with different parameters does not. The cache is an LRU
+bounded both by entry count and by the estimated size of the cached rows.
+Every entry expires after its TTL.
+
+Each entry remembers the tables its query reads. Writes made inside
+track_writes() (which transactional uses) are seen through the sqlite
+trace callback, and once they commit, every cached result that depends
+on a written table is dropped:
+
+    cache = QueryCache(max_entries=1000, max_bytes=16 << 20, ttl=60)
+    rows = cache.get_or_load(make_key(sql, params), load, read_tables(sql))
+
+Concurrent misses on one key run a single load (see QueryCache).
+"""
+import contextlib
+import functools
+import itertools
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 * 1024 * 1024
+TTL = 300.0
+
+COUNTERS = ("hits", "misses", "coalesced", "stale_hits", "refreshes", "evictions",
+            "expirations", "invalidations", "too_large")
+
+ALL_TABLES = "*"  # dependency of a query whose tables could not be read
+
+_LITERAL = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r"\s+")
+_READS = re.compile(r"\b(?:FROM|JOIN)\s+([\w.\"`\[\]]+(?:\s+(?:AS\s+)?\w+)?"
+                    r"(?:\s*,\s*[\w.\"`\[\]]+(?:\s+(?:AS\s+)?\w+)?)*)", re.IGNORECASE)
+_WRITES = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|"
+                     r"UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+([\w.\"`\[\]]+)", re.IGNORECASE)
+_SCHEMA = re.compile(r"^\s*(?:DROP|ALTER)\s+TABLE\s+(?:IF\s+EXISTS\s+)?([\w.\"`\[\]]+)",
+                     re.IGNORECASE)
+
+
+def _table(name):
+    return name.strip("\"`[]").split(".")[-1].lower()
+
+
+@functools.lru_cache(maxsize=1024)
+def normalise_sql(sql):
+    """Case-fold and collapse whitespace outside quotes; drop trailing semicolons.
+
+    Keywords and unquoted identifiers are case-insensitive in SQL; string
+    literals and quoted identifiers are kept as written.
+    """
+    parts = _LITERAL.split(sql)
+    for index in range(0, len(parts), 2):  # even parts are outside quotes
+        parts[index] = _SPACE.sub(" ", parts[index]).lower()
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+@functools.lru_cache(maxsize=1024)
+def read_tables(sql):
+    """Return the tables a SELECT reads, or {ALL_TABLES} when none are found."""
+    code = _STRING.sub("''", sql)
+    tables = set()
+    for listing in _READS.findall(code):
+        for item in listing.split(","):
+            tables.add(_table(item.split()[0]))
+    return frozenset(tables) or frozenset([ALL_TABLES])
+
+
+def written_table(sql):
+    """Return the table an INSERT/UPDATE/DELETE/DROP statement writes, or None."""
+    match = _WRITES.match(sql) or _SCHEMA.match(sql)
+    return _table(match.group(1)) if match else None
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def make_key(sql, params=()):
+    """Cache key for `sql` run with `params` (a sequence or a mapping)."""
+    return normalise_sql(sql), _freeze(params)
+
+
+def _row_size(row):
+    size = sys.getsizeof(row)
+    if isinstance(row, (list, tuple)):
+        size += sum(map(sys.getsizeof, row))
+    return size
+
+
+def estimate_size(value, sample=16):
+    """Approximate bytes held by a query result (rows of scalars).
+
+    Rows of one result have the same shape, so the row size is averaged
+    over at most `sample` evenly spaced rows instead of measuring them all.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)) and value:
+        rows = value[::-(-len(value) // sample)]
+        size += sum(map(_row_size, rows)) * len(value) // len(rows)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "stale_until", "tables", "refreshing")
+
+    def __init__(self, value, size, expires_at, stale_until, tables):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.tables = tables
+        self.refreshing = False
+
+
+class _Flight:
+    """A load in progress; callers missing on the same key wait for it."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """Thread-safe LRU of query results with TTLs and table invalidation.
+
+    max_entries and max_bytes bound the whole cache: there is one LRU,
+    and one lock guards it, and the loads in flight, for the few dictionary
+    operations of a lookup. Loads run outside that lock.
+
+    get_or_load() runs a loader at most once per key at a time: concurrent
+    misses on the same key wait for the first caller's result. With
+    `stale_ttl`, an expired entry is still served for that many seconds
+    while a single caller reloads it.
+
+    With a `disk` tier (see disk_cache.py), misses are looked up there
+    before load() runs, and loaded results are written through to it.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=TTL,
+                 stale_ttl=0.0, disk=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk = disk  # optional second tier, e.g. disk_cache.DiskCache
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> _Entry, least recently used first
+        self._by_table = {}  # table -> set of keys
+        self._bytes = 0
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._flights = {}  # key -> _Flight
+        self._generations = itertools.count(1)
+        self._generation = 0  # bumped by every invalidation
+        _caches.add(self)
+
+    # The helpers below expect self._lock to be held.
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+        return entry
+
+    def _find(self, key, now):
+        """The entry for `key` unless it is past its stale window."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until <= now:
+            self._remove(key)
+            self._counters["expirations"] += 1
+            entry = None
+        return entry
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        if entry.size > self.max_bytes:
+            self._counters["too_large"] += 1
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        for table in entry.tables:
+            self._by_table.setdefault(table, set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def _cached(self, key, now):
+        """(True, value) when the cache can answer, else (False, entry to refresh or None)."""
+        entry = self._find(key, now)
+        if entry is None:
+            return False, None
+        self._entries.move_to_end(key)
+        if entry.expires_at > now:
+            self._counters["hits"] += 1
+            return True, entry.value
+        if entry.refreshing:
+            self._counters["stale_hits"] += 1
+            return True, entry.value
+        entry.refreshing = True
+        self._counters["refreshes"] += 1
+        return False, entry
+
+    def get(self, key):
+        """Return (True, value) for a live entry, else (False, None)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._find(key, now)
+            if entry is None or entry.expires_at <= now:
+                self._counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return True, entry.value
+
+    @property
+    def generation(self):
+        """Take this before running a query and pass it to put() as `since`."""
+        return self._generation
+
+    def put(self, key, value, tables=(ALL_TABLES,), ttl=None, since=None):
+        """Cache `value` under `key`, evicting least recently used entries.
+
+        With `since` (a generation taken before the query ran), the value
+        is not cached if an invalidation happened while the query ran: it
+        may predate the write.
+        """
+        size = estimate_size(value)
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if since is not None and since != self._generation or ttl <= 0:
+                if key in self._entries:
+                    self._remove(key)
+                return
+            expires_at = time.monotonic() + ttl
+            self._store(key, _Entry(value, size, expires_at, expires_at + self.stale_ttl,
+                                    frozenset(tables)))
+
+    def get_or_load(self, key, load, tables=(ALL_TABLES,), ttl=None):
+        """Return the cached value for `key`, calling load() to fill a miss.
+
+        Only one caller runs load() for a key at a time; the others wait
+        for its result (or its exception). An entry inside its stale window
+        is returned as is to everyone except the one caller that reloads it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            done, entry = self._cached(key, now)
+        if done:
+            return entry
+        flight = None
+        if entry is None:
+            with self._lock:
+                # a load may have finished since the first look
+                done, entry = self._cached(key, now)
+                if done:
+                    return entry
+                if entry is None:
+                    flight = self._flights.get(key)
+                    waiting = flight is not None
+                    if waiting:
+                        self._counters["coalesced"] += 1
+                    else:
+                        self._counters["misses"] += 1
+                        flight = self._flights[key] = _Flight()
+            if flight is not None and waiting:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+        since = self._generation
+        try:
+            value, ttl = self._load_through(key, load, tables, ttl)
+            self.put(key, value, tables, ttl, since)
+        except BaseException as error:
+            if flight is not None:
+                flight.error = error
+            else:
+                with self._lock:
+                    entry.refreshing = False  # let the next caller retry
+            raise
+        else:
+            if flight is not None:
+                flight.value = value
+            return value
+        finally:
+            if flight is not None:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+    def _load_through(self, key, load, tables, ttl):
+        """Fill a miss from the disk tier, else from load(); returns (value, ttl)."""
+        if self.disk is None:
+            return load(), ttl
+        ttl = self.ttl if ttl is None else ttl
+        found, value, remaining = self.disk.get(key)
+        if found:
+            return value, min(ttl, remaining)
+        since = self.disk.generation()
+        value = load()
+        if since is not None:  # unknown generation: a write may have been missed
+            self.disk.put(key, value, tables, ttl, since)
+        return value, ttl
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that reads one of `tables`; returns how many."""
+        tables = [_table(table) for table in tables]
+        with self._lock:
+            # bump first: a load that started before this point must not be cached
+            self._generation = next(self._generations)
+            keys = set(self._by_table.get(ALL_TABLES, ()))
+            for table in tables:
+                keys |= self._by_table.get(table, set())
+            for key in keys:
+                self._remove(key)
+            self._counters["invalidations"] += len(keys)
+        if self.disk is not None:
+            self.disk.invalidate_tables(tables)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), bytes=self._bytes,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes)
+
+
+_caches = weakref.WeakSet()
+
+
+def invalidate_tables(tables):
+    """Invalidate `tables` in every QueryCache of this process."""
+    tables = list(tables)
+    if tables:
+        for cache in list(_caches):
+            cache.invalidate_tables(tables)
+
+
+@contextlib.contextmanager
+def track_writes(conn):
+    """Collect the tables written through `conn` inside the with block.
+
+    Yields the set of table names, filled in by the connection's trace
+    callback as statements run. The trace callback is removed on exit.
+    """
+    written = set()
+
+    def trace(statement):
+        table = written_table(statement)
+        if table is not None:
+            written.add(table)
+
+    conn.set_trace_callback(trace)
+    try:
+        yield written
+    finally:
+        conn.set_trace_callback(None)
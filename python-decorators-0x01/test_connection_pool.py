@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Unit tests for connection_pool.SQLitePool, against a temporary sqlite file.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import connection_pool
+
+
+class TestSQLitePool(unittest.TestCase):
+    """Tests for SQLitePool reuse, limits, reset and close()"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "users.db")
+
+    def make_pool(self, **kwargs):
+        pool = connection_pool.SQLitePool(self.path, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_released_connection_is_reused(self):
+        """A thread gets back the connection it released"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual((pool.stats()["hits"], pool.stats()["misses"]), (1, 1))
+
+    def test_acquire_waits_at_max_size(self):
+        """With max_size connections out, acquire() waits for one to come back"""
+        pool = self.make_pool(max_size=1, timeout=5.0)
+        held = pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+        waiter.join(0.2)
+        self.assertEqual(got, [])
+        pool.release(held)
+        waiter.join(2.0)
+        self.assertEqual(got, [held])
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_acquire_times_out(self):
+        """acquire() raises TimeoutError when no connection frees up in time"""
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+
+    def test_release_after_close_closes_connection(self):
+        """A connection in use during close() is closed, not pooled, on release"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.close()
+        pool.release(conn)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        self.assertEqual((pool.stats()["idle"], pool.stats()["open"]), (0, 0))
+
+    def test_acquire_after_close_raises(self):
+        """acquire() on a closed pool raises RuntimeError"""
+        pool = self.make_pool()
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+    def test_release_resets_connection_state(self):
+        """isolation_level, row_factory and open transactions don't leak to the next user"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.isolation_level = None
+        conn.row_factory = sqlite3.Row
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO t VALUES (1)")
+        pool.release(conn)
+        conn = pool.acquire()
+        self.assertEqual(conn.isolation_level, "")
+        self.assertIsNone(conn.row_factory)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone(), (0,))
+
+    def test_get_pool_replaces_closed_pool(self):
+        """get_pool() hands out a new pool once the shared one was closed"""
+        pool = connection_pool.get_pool(self.path)
+        pool.close()
+        fresh = connection_pool.get_pool(self.path)
+        self.addCleanup(fresh.close)
+        self.assertIsNot(fresh, pool)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for disk_cache.DiskCache behind result_cache.QueryCache.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import connection_pool
+from disk_cache import DiskCache
+from result_cache import QueryCache, make_key, read_tables
+
+SQL = "SELECT * FROM users WHERE age = ?"
+
+
+class Loader:
+    """A load() returning `value` and counting its calls."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+class TestDiskTier(unittest.TestCase):
+    """Two QueryCaches sharing one cache file, as two workers would"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "query_cache.db")
+        self.addCleanup(lambda: connection_pool.get_pool(self.path).close())
+        self.key = make_key(SQL, (30,))
+        self.tables = read_tables(SQL)
+
+    def worker(self):
+        """A QueryCache with an empty memory tier over the shared file."""
+        return QueryCache(disk=DiskCache(self.path))
+
+    def test_second_worker_reads_disk_tier(self):
+        """A result loaded by one worker is found on disk by another"""
+        self.worker().get_or_load(self.key, Loader([(1, "a")]), self.tables)
+        load = Loader([(2, "b")])
+        self.assertEqual(self.worker().get_or_load(self.key, load, self.tables), [(1, "a")])
+        self.assertEqual(load.calls, 0)
+
+    def test_write_invalidates_disk_tier(self):
+        """Invalidating a table in one worker makes the other reload"""
+        first, second = self.worker(), self.worker()
+        first.get_or_load(self.key, Loader([(1, "a")]), self.tables)
+        first.invalidate_tables(["users"])
+        load = Loader([(1, "changed")])
+        self.assertEqual(second.get_or_load(self.key, load, self.tables), [(1, "changed")])
+        self.assertEqual(load.calls, 1)
+
+    def test_unrelated_write_keeps_entry(self):
+        """Invalidating another table leaves the disk entry in place"""
+        first, second = self.worker(), self.worker()
+        first.get_or_load(self.key, Loader([(1, "a")]), self.tables)
+        first.invalidate_tables(["orders"])
+        load = Loader([(1, "changed")])
+        self.assertEqual(second.get_or_load(self.key, load, self.tables), [(1, "a")])
+
+    def test_unknown_generation_is_not_stored(self):
+        """A load is not written to disk when the generation could not be read"""
+        cache = self.worker()
+        cache.disk.generation = lambda: None
+        cache.get_or_load(self.key, Loader([(1, "a")]), self.tables)
+        self.assertEqual(cache.disk.stats()["entries"], 0)
+
+    def test_load_overlapping_invalidation_is_not_stored(self):
+        """A result loaded while another worker wrote the table is not persisted"""
+        first, second = self.worker(), self.worker()
+
+        def load():
+            second.invalidate_tables(["users"])
+            return [(1, "before write")]
+        first.get_or_load(self.key, load, self.tables)
+        self.assertEqual(first.disk.stats()["entries"], 0)
+
+    def test_disk_entry_uses_cache_ttl(self):
+        """Entries written through expire on disk with the QueryCache's TTL"""
+        load = Loader([(1, "a")])
+        QueryCache(ttl=0.2, disk=DiskCache(self.path)).get_or_load(self.key, load, self.tables)
+        conn = sqlite3.connect(self.path)
+        (lifetime,) = conn.execute("SELECT expires_at - accessed_at FROM entries").fetchone()
+        conn.close()
+        self.assertAlmostEqual(lifetime, 0.2, delta=0.05)
+        time.sleep(0.3)
+        QueryCache(ttl=0.2, disk=DiskCache(self.path)).get_or_load(self.key, load, self.tables)
+        self.assertEqual(load.calls, 2)
+
+    def test_clear_survives_sqlite_errors(self):
+        """clear() counts a failure as an error instead of raising"""
+        disk = DiskCache(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.execute("DROP TABLE entries")
+        conn.close()
+        disk.clear()
+        self.assertEqual(disk.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
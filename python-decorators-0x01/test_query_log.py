@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for query_log.QueryLog.
+"""
+import io
+import json
+import os
+import threading
+import time
+import unittest
+
+from query_log import QueryLog, fingerprint, params_hash
+
+SQL = "SELECT * FROM users WHERE id = ?"
+
+
+def writers():
+    return sum(thread.name == "query-log-writer" for thread in threading.enumerate())
+
+
+class TestQueryLog(unittest.TestCase):
+    """Tests for recording and writing query events"""
+
+    def test_concurrent_records_written_once(self):
+        """Events recorded from many threads are each written exactly once, by one writer"""
+        stream = io.StringIO()
+        log = QueryLog(stream, capacity=100_000, flush_interval=0.01)
+        before = writers()
+        start = threading.Barrier(8)
+
+        def work(offset):
+            start.wait()
+            for i in range(offset, 8000, 8):
+                log.record(SQL, (i,), 0.001, [(i,)])
+        threads = [threading.Thread(target=work, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(writers() - before, 1)
+        time.sleep(0.05)
+        log.flush()
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(len(events), 8000)
+        self.assertEqual({event["params"] for event in events},
+                         {params_hash((i,)) for i in range(8000)})
+        self.assertEqual(log.stats()["written"], 8000)
+
+    def test_event_fields(self):
+        """An event carries the fingerprint, params hash, duration, rows and error"""
+        stream = io.StringIO()
+        log = QueryLog(stream)
+        log.record("SELECT * FROM users WHERE id = 42", (), 0.0025, [(1,), (2,)])
+        log.record(SQL, (7,), 0.001, error="OperationalError")
+        log.flush()
+        first, second = map(json.loads, stream.getvalue().splitlines())
+        self.assertEqual(first["fingerprint"], "select * from users where id = ?")
+        self.assertEqual((first["params"], first["ms"], first["rows"]), (None, 2.5, 2))
+        self.assertEqual((second["params"], second["error"]),
+                         (params_hash((7,)), "OperationalError"))
+
+    def test_params_hashed_when_recorded(self):
+        """Changing the parameters after record() does not change the logged hash"""
+        stream = io.StringIO()
+        log = QueryLog(stream, flush_interval=60)
+        params = [7]
+        log.record(SQL, params, 0.001)
+        params.append(8)
+        log.flush()
+        self.assertEqual(json.loads(stream.getvalue())["params"], params_hash([7]))
+
+    def test_full_buffer_drops(self):
+        """Events past capacity are dropped and counted, not waited for"""
+        log = QueryLog(io.StringIO(), capacity=10, flush_interval=60)
+        for i in range(25):
+            log.record(SQL, (i,), 0.001)
+        stats = log.stats()
+        self.assertEqual((stats["pending"], stats["dropped"]), (10, 15))
+
+    def test_sampling_keeps_slow_queries(self):
+        """With sample_rate 0 only queries over always_over_ms are kept"""
+        log = QueryLog(io.StringIO(), sample_rate=0.0, always_over_ms=100)
+        log.record(SQL, (), 0.001)
+        log.record(SQL, (), 0.5)
+        stats = log.stats()
+        self.assertEqual((stats["recorded"], stats["sampled_out"]), (1, 1))
+
+    def test_fingerprint_collapses_literals(self):
+        """Literals and IN lists don't change the fingerprint"""
+        self.assertEqual(fingerprint("select * from t where a in (1, 2, 3) and b = 'x'"),
+                         fingerprint("SELECT *  FROM t WHERE a IN (4,5) AND b = 'y'"))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_child_does_not_inherit_queue(self):
+        """A forked child starts with an empty buffer and its own writer"""
+        read, write = os.pipe()
+        log = QueryLog(io.StringIO(), flush_interval=60)
+        log.record(SQL, (1,), 0.001)
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, str(log.stats()["pending"]).encode())
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(os.read(read, 16), b"0")
+        self.assertEqual(log.stats()["pending"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
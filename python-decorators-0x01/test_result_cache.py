@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Unit tests for result_cache.QueryCache.
+"""
+import threading
+import time
+import unittest
+
+from result_cache import QueryCache, estimate_size
+
+
+class Loader:
+    """A load() that counts its calls and can be held until released."""
+
+    def __init__(self, value="rows", hold=False):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        self.release.wait(5.0)
+        return self.value
+
+
+def run_threads(count, target):
+    results = [None] * count
+
+    def call(index):
+        results[index] = target()
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Concurrent misses on one key run one load"""
+
+    def test_concurrent_misses_coalesce(self):
+        """Callers that miss while a load runs wait for it instead of loading again"""
+        cache = QueryCache()
+        load = Loader([(1,)], hold=True)
+        first, results = run_threads(1, lambda: cache.get_or_load("k", load))
+        self.assertTrue(load.started.wait(2.0))
+        others, other_results = run_threads(8, lambda: cache.get_or_load("k", load))
+        while cache.stats()["coalesced"] < 8:
+            time.sleep(0.01)
+        load.release.set()
+        for thread in first + others:
+            thread.join(2.0)
+        self.assertEqual(load.calls, 1)
+        self.assertEqual(results + other_results, [[(1,)]] * 9)
+
+    def test_load_error_reaches_waiters(self):
+        """A failed load raises in every waiting caller and is not cached"""
+        cache = QueryCache()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5.0)
+            raise ValueError("boom")
+        errors = []
+
+        def call():
+            try:
+                cache.get_or_load("k", fail)
+            except ValueError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.stats()["misses"] + cache.stats()["coalesced"] < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(2.0)
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(cache.get_or_load("k", lambda: "ok"), "ok")
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """Expired entries inside stale_ttl are served while one caller reloads"""
+
+    def test_stale_value_served_during_refresh(self):
+        """One caller refreshes; the others get the stale value without waiting"""
+        cache = QueryCache(ttl=0.05, stale_ttl=10.0)
+        cache.get_or_load("k", lambda: "old")
+        time.sleep(0.1)
+        load = Loader("new", hold=True)
+        refresher, results = run_threads(1, lambda: cache.get_or_load("k", load))
+        self.assertTrue(load.started.wait(2.0))
+        self.assertEqual(cache.get_or_load("k", Loader("unused")), "old")
+        load.release.set()
+        refresher[0].join(2.0)
+        self.assertEqual(results, ["new"])
+        self.assertEqual(cache.get_or_load("k", Loader("unused")), "new")
+        stats = cache.stats()
+        self.assertEqual((stats["refreshes"], stats["stale_hits"]), (1, 1))
+
+    def test_past_stale_window_loads(self):
+        """An entry past ttl + stale_ttl is a plain miss"""
+        cache = QueryCache(ttl=0.02, stale_ttl=0.02)
+        cache.get_or_load("k", lambda: "old")
+        time.sleep(0.1)
+        self.assertEqual(cache.get_or_load("k", lambda: "new"), "new")
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class TestLimits(unittest.TestCase):
+    """max_entries and max_bytes apply to the whole cache"""
+
+    def test_large_result_fits_in_max_bytes(self):
+        """A result under max_bytes is cached even when it is large"""
+        cache = QueryCache(max_entries=10, max_bytes=16 << 20)
+        rows = [("x" * 1000,)] * 4000
+        self.assertGreater(estimate_size(rows), 4 << 20)
+        load = Loader(rows)
+        for _ in range(3):
+            cache.get_or_load("big", load)
+        self.assertEqual(load.calls, 1)
+        self.assertEqual(cache.stats()["too_large"], 0)
+
+    def test_result_over_max_bytes_is_not_cached(self):
+        """A result larger than max_bytes is returned but not kept"""
+        cache = QueryCache(max_bytes=1024)
+        self.assertEqual(cache.get_or_load("big", lambda: ["x" * 4096]), ["x" * 4096])
+        self.assertEqual(cache.stats()["too_large"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_max_entries_is_global(self):
+        """Exactly max_entries keys are kept, evicting least recently used first"""
+        cache = QueryCache(max_entries=10)
+        for key in range(10):
+            cache.put(key, [key])
+        cache.get(0)
+        cache.put(10, [10])
+        self.assertEqual(cache.stats()["entries"], 10)
+        self.assertEqual(cache.get(0), (True, [0]))
+        self.assertEqual(cache.get(1), (False, None))
+
+    def test_max_bytes_evicts_lru(self):
+        """Adding past max_bytes evicts the least recently used entries"""
+        size = estimate_size(["x" * 1000])
+        cache = QueryCache(max_bytes=size * 3)
+        for key in range(4):
+            cache.put(key, ["x" * 1000])
+        self.assertEqual(cache.get(0), (False, None))
+        self.assertLessEqual(cache.stats()["bytes"], size * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,26 +1,44 @@
-import mysql.connector
-def stream_users():
-        """Generator that streams rows from user_data table one by one"""
-        try:
-                conn=mysql.connector.connect(
-                        host="localhost",
-                        user="root",
-                        password="bw123bwc",
-                        database="Alx_prodev"
+import pymysql
+
+from query import build_select
+from rows import convert_rows
+
+seed = __import__('seed')
+
+# rows pulled from the server per round trip; the only rows held client-side
+PREFETCH_ROWS = 100
+
 
-                )
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("SELECT * FROM user_data")                
-                for row in cursor:
-                        yield row
+def stream_users(prefetch=PREFETCH_ROWS, columns=None, where=None, row_format="dict"):
+        """Generator that streams rows from user_data table one by one
+
+        Rows are read through an unbuffered cursor, `prefetch` rows at a
+        time, so memory use is bounded by the prefetch window rather than
+        by the size of the table. `columns` and `where` are pushed down into
+        the SELECT (see query.build_select). `row_format` is "dict", "tuple"
+        or "record" (see rows.convert_rows).
+        """
+        conn = None
+        cursor = None
+        try:
+                conn = seed.connect_to_prodev()
+                if conn is None:
+                        return
+                cursor = conn.cursor(pymysql.cursors.SSCursor)
+                cursor.execute(*build_select(columns, where))
+                names = [column[0] for column in cursor.description]
+                while True:
+                        rows = cursor.fetchmany(prefetch)
+                        if not rows:
+                                break
+                        yield from convert_rows(rows, names, row_format)
+                cursor.close()
+                cursor = None
         except Exception as e:
                 print(f"Error: {e}")
         finally:
-                if cursor:
-                        cursor.close()
-                if conn and conn.is_connected():
+                # An unbuffered cursor left half-read (e.g. by islice) cannot be
+                # closed without draining the rest of the table; the pool sees
+                # the unread result and drops the connection instead of reusing it.
+                if conn:
                         conn.close()
-    
-
-            
-
@@ -1,42 +1,130 @@
-import mysql.connector
+import time
+import pymysql
+from contextlib import closing
 
-def stream_users_in_batches(batch_size):
-    """
-    Generator that fetches rows from user_data in batches.
-    Each batch is a list of dictionaries (rows).
+from batch_sizer import estimate_row_bytes
+from checkpoint import as_checkpoint
+
+from query import build_select, select_columns
+from prefetch import prefetched
+from rows import convert_rows, to_columns
+from snapshot import Snapshot
+
+seed = __import__('seed')
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+def _database_batches(batch_size, columns, where, sizer=None):
+    """Yield (column_names, row tuples) batches read from MySQL.
+
+    With a `sizer` each fetch uses `sizer.size` rows and reports its
+    duration and row size back to it.
     """
+    connection = None
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="dbw123bw",
-            database="ALX_prodev"
-        )
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
+        connection = seed.connect_to_prodev()
+        if connection is None:
+            return
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(*build_select(columns, where))
+        names = [column[0] for column in cursor.description]
 
         while True:
-            batch = cursor.fetchmany(batch_size)  # fetch a chunk of rows
+            started = time.perf_counter()
+            batch = cursor.fetchmany(sizer.size if sizer else batch_size)  # fetch a chunk of rows
             if not batch:
                 break
-            yield batch  # yield the batch
+            if sizer:
+                sizer.observe(len(batch), time.perf_counter() - started,
+                              estimate_row_bytes(batch[0]))
+            yield names, batch
+        cursor.close()
 
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
+        # returns the connection to the pool, which drops it if a result
+        # was left half-read
+        if connection:
             connection.close()
 
 
+def _snapshot_batches(batch_size, columns, where, snapshot):
+    """Yield (column_names, row tuples) batches read from a local snapshot."""
+    names = select_columns(columns)
+    for batch in Snapshot(snapshot).batches(batch_size, names, where):
+        yield names, batch
+
+
+def _formatted(source, columnar, row_format):
+    with closing(source):
+        for names, batch in source:
+            if columnar:
+                yield to_columns(batch, names, columnar)
+            else:
+                yield convert_rows(batch, names, row_format)  # yield the batch
+
+
+def stream_users_in_batches(batch_size, columns=None, where=None, columnar=None,
+                            row_format="dict", snapshot=None, read_ahead=0, sizer=None):
+    """
+    Generator that fetches rows from user_data in batches.
+    Each batch is a list of dictionaries (rows), or of tuples / records
+    when `row_format` is "tuple" or "record".
+    Only `columns` of the rows matching `where` are read from the server.
+
+    With columnar="array" (or "numpy") each batch is instead a dict of
+    column name -> column values, see rows.to_columns.
+
+    `snapshot` is the path of a local snapshot (see snapshot.py) to read
+    instead of the database.
+
+    With read_ahead=N up to N further batches are fetched on a background
+    thread while the caller processes the current one.
+
+    With a `sizer` (batch_sizer.AdaptiveBatchSize) the database fetch size
+    is tuned batch by batch instead of staying at `batch_size`; the chosen
+    sizes are available from `sizer.metrics`.
+    """
+    if snapshot:
+        source = _snapshot_batches(batch_size, columns, where, snapshot)
+    else:
+        source = _database_batches(batch_size, columns, where, sizer)
+    batches = _formatted(source, columnar, row_format)
+    if read_ahead:
+        batches = prefetched(batches, read_ahead)
+    with closing(batches):
+        yield from batches
+
+
 ## Write a function batch_processing() that processes each batch to filter users over the age of 25
-def batch_processing(batch_size):
-        for batch in stream_users_in_batches(batch_size):
-            for user in batch:
-                if user['age']>25:
-                    yield user
-        return 
+def batch_processing(batch_size, columns=None, snapshot=None, checkpoint=None):
+        """Yield users over the age of 25; the filter runs in SQL on the age index.
+
+        With a `checkpoint` (a path or checkpoint.Checkpoint) users come in
+        user_id order, progress is saved periodically, and a restarted run
+        resumes after the last batch that was fully consumed.
+        """
+        where = [('age', '>', 25)]
+        if checkpoint:
+            yield from _resumable_processing(batch_size, columns, where,
+                                             as_checkpoint(checkpoint))
+            return
+        for batch in stream_users_in_batches(batch_size, columns, where, snapshot=snapshot):
+            yield from batch
+
+
+def _resumable_processing(batch_size, columns, where, checkpoint):
+        saved = checkpoint.load() or {}
+        last_user_id = saved.get('last_user_id')
+        rows = saved.get('rows', 0)
+        for page in lazy_paginate(batch_size, columns, where, after=last_user_id):
+            yield from page
+            # only reached once the caller has taken every row of the page
+            rows += len(page)
+            last_user_id = page[-1]['user_id']
+            if checkpoint.due():
+                checkpoint.save(last_user_id, rows)
+        checkpoint.clear()
 
 
 
@@ -3,6 +3,7 @@ processing = __import__('1-batch_processing')
 
 ##### print processed users in a batch of 50
 try:
-    processing.batch_processing(50)
+    for user in processing.batch_processing(50):
+        print(user)
 except BrokenPipeError:
     sys.stderr.close()
@@ -1,42 +1,76 @@
+from query import build_select, select_columns
+from rows import convert_rows
 
 seed = __import__('seed')
 
-def paginate_users(page_size, offset):
+def paginate_users(connection, page_size, last_user_id=None, columns=None, where=None,
+                   row_format="dict"):
         """
-    Fetch a page of users from the database.
+    Fetch the page of users that follows `last_user_id`.
+
+    Pages are read with a keyset seek on the user_id primary key instead of
+    OFFSET, so every page costs an index lookup plus `page_size` rows no
+    matter how deep into the table it is.
 
     Args:
+        connection: Open connection to the ALX_prodev database
         page_size (int): Number of users per page
-        offset (int): Row offset in the table
+        last_user_id (str): user_id of the last row of the previous page,
+            or None for the first page
+        columns (list): Columns to fetch (user_id is always included)
+        where (list): (column, operator, value) filters applied in SQL
+        row_format (str): "dict", "tuple" or "record"
 
     Returns:
-        list of dict: List of user rows
+        list: List of user rows ordered by user_id
     """
-        connection=seed.connect_to_prodev()
-        cursor=connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-        rows=cursor.fetchall()
-        cursor.close()
-        connection.close()
-        return rows
+        columns = select_columns(columns)
+        if 'user_id' not in columns:
+                columns.append('user_id')
+        where = list(where or ())
+        if last_user_id is not None:
+                where.append(('user_id', '>', last_user_id))
+        sql, params = build_select(columns, where, order_by='user_id', limit=page_size)
+        with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return convert_rows(cursor.fetchall(), columns, row_format)
 
 
-def paginate_users(page_size, offset):
+def lazy_paginate(page_size, columns=None, where=None, row_format="dict", after=None):
          """
     Generator that lazily fetches users from the database page by page.
 
+    A single connection is opened for the whole walk and reused for every
+    page.
+
     Args:
         page_size (int): Number of users per page
+        columns (list): Columns to fetch
+        where (list): (column, operator, value) filters applied in SQL
+        row_format (str): "dict", "tuple" or "record"
+        after (str): Start with the rows following this user_id, e.g. to
+            resume an interrupted walk
 
     Yields:
-        list of dict: One page of users at a time
+        list: One page of users at a time
     """
-         offset=0
-         while True:
-                 page=paginate_users(page_size, offset)
-                 if not page:
-                         break
-                 yield page
-                 offset+=page_size # move the offset to next page
-         return 
-
+         connection = seed.connect_to_prodev()
+         if connection is None:
+                 return
+         columns = select_columns(columns)
+         if 'user_id' not in columns:
+                 columns.append('user_id')
+         key = columns.index('user_id')
+         try:
+                 last_user_id = after
+                 while True:
+                         rows = paginate_users(connection, page_size, last_user_id,
+                                               columns, where, "tuple")
+                         if not rows:
+                                 break
+                         yield convert_rows(rows, columns, row_format)
+                         if len(rows) < page_size:
+                                 break # short page: nothing left to seek to
+                         last_user_id = rows[-1][key] # seek past this page
+         finally:
+                 connection.close()
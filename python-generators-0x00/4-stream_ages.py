@@ -16,36 +16,80 @@
 
 # You are not allowed to use the SQL AVERAGE
 
-import mysql.connector
-from seed import connect_to_prodev  
-def stream_user_ages():
-    """Generator that yields user ages one by one"""
+import pymysql
+from seed import connect_to_prodev
+from query import build_select
+from aggregate import StreamingStats, aggregate
+from partition import parallel_aggregate
+from snapshot import Snapshot
+from checkpoint import as_checkpoint
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+BATCH_SIZE = 1000
+
+def stream_user_ages(where=None, snapshot=None):
+    """Generator that yields user ages one by one, optionally filtered in SQL
+
+    Reads the local snapshot at path `snapshot` instead when one is given.
+    """
+    if snapshot:
+        for batch in Snapshot(snapshot).batches(BATCH_SIZE, ['age'], where):
+            yield from (age for (age,) in batch)
+        return
     conn = None
     cursor = None
     try:
         conn = connect_to_prodev()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT age FROM user_data")
-        for row in cursor:
-            yield row['age']
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        cursor.execute(*build_select(['age'], where))
+        for (age,) in cursor:
+            yield age
     finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
+        # returns the connection to the pool, which drops it if a result
+        # was left half-read
+        if conn:
             conn.close()
 
-def calculate_average_age():
-    """Calculates average age without loading entire dataset into memory"""
-    total = 0
-    count = 0
-    for age in stream_user_ages():
-        total += age
-        count += 1
-    if count > 0:
-        average = total / count
-        print(f"Average age of users: {average}")
+def _resumable_ages(checkpoint):
+    """Aggregate ages in user_id order, saving (last user_id, stats) as it goes."""
+    saved = checkpoint.load()
+    stats = StreamingStats.from_dict(saved['state']) if saved else StreamingStats()
+    last_user_id = saved['last_user_id'] if saved else None
+    for page in lazy_paginate(BATCH_SIZE, ['age'], after=last_user_id, row_format='tuple'):
+        stats.update_many(age for age, _ in page)
+        last_user_id = page[-1][1]
+        if checkpoint.due():
+            checkpoint.save(last_user_id, stats.count, stats.to_dict())
+    checkpoint.clear()
+    return stats
+
+def calculate_average_age(partitions=1, columnar=None, snapshot=None, checkpoint=None):
+    """Calculates average age without loading entire dataset into memory
+
+    With partitions > 1 the table is scanned by that many worker processes,
+    one user_id range each, and their partial results are merged.
+    With columnar="array" or "numpy" ages are read and summarised a whole
+    batch at a time. With a `snapshot` path the ages come from the local
+    snapshot instead of the database. With a `checkpoint` path the partial
+    result is saved periodically and an interrupted run resumes from it.
+    """
+    if checkpoint:
+        stats = _resumable_ages(as_checkpoint(checkpoint))
+    elif partitions > 1 and not snapshot:
+        stats = parallel_aggregate('age', partitions)
+    elif columnar:
+        stats = StreamingStats()
+        for batch in stream_users_in_batches(BATCH_SIZE, ['age'], columnar=columnar,
+                                             snapshot=snapshot):
+            stats.update_many(batch['age'])
+    else:
+        stats = aggregate(stream_user_ages(snapshot=snapshot))
+    if stats.count > 0:
+        print(f"Average age of users: {stats.mean}")
     else:
         print("No users found.")
+    return stats
 
 if __name__ == "__main__":
     calculate_average_age()
@@ -0,0 +1,257 @@
+"""
+One-pass, constant-memory aggregates over a stream of numbers, such as the
+ages yielded by stream_user_ages() or a column of any other generator here.
+
+Partial results computed on separate streams can be merged, so a table can
+be aggregated in pieces and combined afterwards.
+"""
+import math
+import random
+from array import array
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
+
+
+class KLLSketch:
+    """Approximate quantiles in O(k log(n/k)) memory (Karnin, Lang, Liberty).
+
+    Each level keeps a small sorted buffer; when a level overflows, half of
+    its items are promoted to the next level with twice the weight.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.compactors = [[]]
+        self.size = 0
+        self.max_size = 0
+        self._random = random.Random(seed)
+        self._update_max_size()
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _update_max_size(self):
+        self.max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for level, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                    self._update_max_size()
+                items.sort()
+                leftover = items.pop() if len(items) % 2 else None
+                self.compactors[level + 1].extend(items[self._random.randint(0, 1)::2])
+                items.clear()
+                if leftover is not None:
+                    items.append(leftover)
+                self.size = sum(len(c) for c in self.compactors)
+                break
+
+    def update_many(self, values):
+        self.compactors[0].extend(values)
+        self.size += len(values)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        self.merge_compactors(other.compactors)
+
+    def merge_compactors(self, compactors):
+        """Merge raw per-level item lists, e.g. restored from to_dict()."""
+        while len(self.compactors) < len(compactors):
+            self.compactors.append([])
+        self._update_max_size()
+        for level, items in enumerate(compactors):
+            self.compactors[level].extend(items)
+        self.size = sum(len(c) for c in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def quantile(self, q):
+        """Return the approximate q-quantile (0 <= q <= 1), or None if empty."""
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        if not weighted:
+            return None
+        target = q * sum(weight for _, weight in weighted)
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+
+class StreamingStats:
+    """Count, sum, mean, variance, min/max, quantiles and a histogram in one pass.
+
+    Mean and variance use Welford's update and Chan's formula for merging,
+    which stay numerically stable on long streams.
+    """
+
+    def __init__(self, bin_width=10, k=200):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.bin_width = bin_width
+        self.bins = {}
+        self.sketch = KLLSketch(k)
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        bin_start = math.floor(value / self.bin_width) * self.bin_width
+        self.bins[bin_start] = self.bins.get(bin_start, 0) + 1
+        self.sketch.update(value)
+        return self
+
+    def update_many(self, values):
+        """Fold in many values; columns from rows.to_columns are summarised in bulk."""
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            return self.merge(self._from_numpy(values))
+        if isinstance(values, array):
+            return self.merge(self._from_array(values))
+        for value in values:
+            self.update(value)
+        return self
+
+    def _empty_like(self):
+        return StreamingStats(self.bin_width, self.sketch.k)
+
+    def _from_array(self, values):
+        batch = self._empty_like()
+        if not values:
+            return batch
+        batch.count = len(values)
+        batch.total = sum(values)
+        batch.mean = batch.total / batch.count
+        batch._m2 = sum((value - batch.mean) ** 2 for value in values)
+        batch.min = min(values)
+        batch.max = max(values)
+        width = self.bin_width
+        batch.bins = dict(Counter(math.floor(value / width) * width for value in values))
+        batch.sketch.update_many(values)
+        return batch
+
+    def _from_numpy(self, values):
+        batch = self._empty_like()
+        if not values.size:
+            return batch
+        batch.count = int(values.size)
+        batch.total = float(values.sum())
+        batch.mean = batch.total / batch.count
+        batch._m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        starts, hits = numpy.unique(numpy.floor(values / self.bin_width) * self.bin_width,
+                                    return_counts=True)
+        batch.bins = {float(start): int(hit) for start, hit in zip(starts, hits)}
+        batch.sketch.update_many(values.tolist())
+        return batch
+
+    def merge(self, other):
+        """Fold another StreamingStats (with the same bin width) into this one."""
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for bin_start, hits in other.bins.items():
+            self.bins[bin_start] = self.bins.get(bin_start, 0) + hits
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, or None when no values were seen."""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def histogram(self):
+        """Return [(bin_start, count)] sorted by bin."""
+        return sorted(self.bins.items())
+
+    def to_dict(self):
+        """JSON-serialisable state, e.g. for checkpoints; see from_dict()."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "m2": self._m2,
+            "min": self.min,
+            "max": self.max,
+            "bin_width": self.bin_width,
+            "bins": self.histogram(),
+            "k": self.sketch.k,
+            "compactors": self.sketch.compactors,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(state["bin_width"], state["k"])
+        stats.count = state["count"]
+        stats.total = state["total"]
+        stats.mean = state["mean"]
+        stats._m2 = state["m2"]
+        stats.min = state["min"]
+        stats.max = state["max"]
+        stats.bins = {bin_start: hits for bin_start, hits in state["bins"]}
+        stats.sketch.merge_compactors(state["compactors"])
+        return stats
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "stddev": self.stddev,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+def aggregate(values, **options):
+    """Consume an iterable of numbers and return its StreamingStats."""
+    return StreamingStats(**options).update_many(values)
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+"""
+Async counterparts of the user_data generators, built on aiomysql.
+
+Every stream is an async generator that only fetches the next batch from
+the server when the consumer asks for it, so a slow consumer applies
+backpressure all the way to MySQL. Streams share one bounded connection
+pool per event loop: at most POOL_SIZE streams hold a connection at once,
+and the rest wait their turn instead of opening more sockets.
+
+    async for user in async_stream_users():
+        ...
+
+The pool is opened by the first stream that needs it and closed when the
+last stream using it finishes, so a loop started with asyncio.run() does
+not leave sockets behind. Wrap a series of streams in pool_scope() to keep
+warm connections between them:
+
+    async with pool_scope():
+        async for user in async_stream_users(): ...
+        async for age in async_stream_user_ages(): ...
+
+Requires aiomysql (see requirements.txt).
+"""
+import asyncio
+import os
+from contextlib import aclosing, asynccontextmanager
+
+import aiomysql
+
+import db_pool
+from query import build_select, select_columns
+from rows import convert_rows
+
+POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "20"))
+PREFETCH_ROWS = 100
+
+_pools = {}  # event loop -> _LoopPool
+
+
+async def _create_pool():
+    return await aiomysql.create_pool(
+        host=db_pool.DB_HOST,
+        user=db_pool.DB_USER,
+        password=db_pool.DB_PASSWORD,
+        db=db_pool.DB_NAME,
+        charset="utf8mb4",
+        autocommit=True,
+        minsize=1,
+        maxsize=POOL_SIZE,
+    )
+
+
+async def _close(task):
+    if not task.done():
+        task.cancel()
+    try:
+        pool = await task
+    except (asyncio.CancelledError, Exception):
+        return  # never opened; the stream that awaited it got the error
+    pool.close()
+    await pool.wait_closed()
+
+
+class _LoopPool:
+    """The connection pool of one event loop and the streams using it."""
+
+    def __init__(self, loop):
+        self.task = loop.create_task(_create_pool())
+        self.users = 0
+        # One slot per connection. Streams wait here rather than in
+        # pool.acquire(): aiomysql only wakes acquire() waiters when an open
+        # connection comes back, not when a stream closes its connection.
+        self.slots = asyncio.Semaphore(POOL_SIZE)
+
+
+@asynccontextmanager
+async def _scope():
+    """Yield (_LoopPool, pool) for the running loop, counting this user."""
+    loop = asyncio.get_running_loop()
+    entry = _pools.get(loop)
+    if entry is None:
+        entry = _pools[loop] = _LoopPool(loop)
+    entry.users += 1
+    try:
+        yield entry, await asyncio.shield(entry.task)
+    finally:
+        entry.users -= 1
+        if not entry.users:
+            del _pools[loop]
+            await _close(entry.task)
+
+
+@asynccontextmanager
+async def pool_scope():
+    """Use the running loop's connection pool for the duration of the block.
+
+    The pool is created on first use and closed when the last block using
+    it exits.
+    """
+    async with _scope() as (_, pool):
+        yield pool
+
+
+async def _stream_batches(sql, params, batch_size):
+    """Yield (column_names, row tuples) from an unbuffered server-side cursor."""
+    async with _scope() as (entry, pool), entry.slots:
+        conn = await pool.acquire()
+        finished = False
+        try:
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            await cursor.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield names, rows
+            await cursor.close()
+            finished = True
+        finally:
+            if not finished:
+                # a half-read result would poison the connection for the next
+                # user; the slot freed below lets a waiter open a new one
+                conn.close()
+            pool.release(conn)
+
+
+async def async_stream_users(prefetch=PREFETCH_ROWS, columns=None, where=None,
+                             row_format="dict"):
+    """Async generator over user_data rows, one at a time."""
+    async with aclosing(_stream_batches(*build_select(columns, where), prefetch)) as batches:
+        async for names, rows in batches:
+            for row in convert_rows(rows, names, row_format):
+                yield row
+
+
+async def async_stream_users_in_batches(batch_size, columns=None, where=None,
+                                        row_format="dict"):
+    """Async generator over user_data rows, `batch_size` rows per batch."""
+    async with aclosing(_stream_batches(*build_select(columns, where), batch_size)) as batches:
+        async for names, rows in batches:
+            yield convert_rows(rows, names, row_format)
+
+
+async def async_lazy_paginate(page_size, columns=None, where=None, row_format="dict"):
+    """Async keyset paginator over user_data, one page per iteration.
+
+    A pooled connection is borrowed only while a page is being read, so
+    idle paginators do not hold connections between pages.
+    """
+    columns = select_columns(columns)
+    if "user_id" not in columns:
+        columns.append("user_id")
+    key = columns.index("user_id")
+    last_user_id = None
+    async with _scope() as (entry, pool):
+        while True:
+            page_where = list(where or ())
+            if last_user_id is not None:
+                page_where.append(("user_id", ">", last_user_id))
+            sql, params = build_select(columns, page_where, order_by="user_id",
+                                       limit=page_size)
+            async with entry.slots, pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, params)
+                    rows = await cursor.fetchall()
+            if not rows:
+                return
+            yield convert_rows(rows, columns, row_format)
+            if len(rows) < page_size:
+                return
+            last_user_id = rows[-1][key]
+
+
+async def async_stream_user_ages(where=None, prefetch=PREFETCH_ROWS):
+    """Async generator over user ages, one at a time."""
+    async with aclosing(_stream_batches(*build_select(["age"], where), prefetch)) as batches:
+        async for _, rows in batches:
+            for (age,) in rows:
+                yield age
+
+
+async def _main():
+    total = count = 0
+    async for age in async_stream_user_ages():
+        total += age
+        count += 1
+    print(f"Average age of users: {total / count if count else 0}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
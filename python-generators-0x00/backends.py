@@ -0,0 +1,250 @@
+"""
+Database backends for the python-generators-0x00 scripts.
+
+The generators only ever call seed.connect_to_prodev() and then use the
+pymysql-style connection API (cursor(), execute() with %s placeholders,
+fetchmany(), commit(), autocommit()). A backend decides what that
+connection is:
+
+    mysql   pooled pymysql connections from db_pool (the default)
+    sqlite  a local SQLite file in WAL mode with a large page cache and
+            memory-mapped reads, for local analytics and tests
+
+Pick one with the DB_BACKEND environment variable. DB_SQLITE_PATH sets the
+SQLite file (default "<DB_NAME>.sqlite3"). Call use() to switch at runtime.
+"""
+import datetime
+import functools
+import itertools
+import os
+import sqlite3
+
+import db_pool
+
+BACKEND = os.getenv("DB_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("DB_SQLITE_PATH")
+
+SQLITE_CACHE_KB = 64 * 1024  # page cache per connection
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024
+
+
+# TIMESTAMP columns of SQLiteBackend.SCHEMA. They come back as datetimes, as
+# they do from MySQL, and datetimes are written with six fractional digits so
+# they also compare correctly as text. This is done in SQLiteCursor rather
+# than with sqlite3.register_converter/register_adapter, which would change
+# every sqlite3 connection in the process.
+TIMESTAMP_COLUMNS = frozenset({"created_at", "updated_at"})
+
+
+def _adapt(params):
+    return [value.isoformat(sep=" ", timespec="microseconds")
+            if isinstance(value, datetime.datetime) else value for value in params]
+
+
+@functools.lru_cache(maxsize=256)
+def _sqlite_sql(sql):
+    """Rewrite the MySQL dialect used by the scripts for SQLite."""
+    return sql.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+
+class SQLiteCursor:
+    """A sqlite3 cursor that accepts the scripts' pymysql-style SQL."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._timestamps = ()  # indexes of TIMESTAMP columns in the result
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _convert(self, row):
+        row = list(row)
+        for index in self._timestamps:
+            if row[index] is not None:
+                row[index] = datetime.datetime.fromisoformat(row[index])
+        return tuple(row)
+
+    def __iter__(self):
+        if not self._timestamps:
+            return iter(self._cursor)
+        return map(self._convert, self._cursor)
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_sqlite_sql(sql), _adapt(params or ()))
+        description = self._cursor.description or ()
+        self._timestamps = tuple(index for index, column in enumerate(description)
+                                 if column[0] in TIMESTAMP_COLUMNS)
+        return self._cursor.rowcount
+
+    def executemany(self, sql, rows):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is not None:
+            rows = itertools.chain([first], rows)
+            # batches are uniform: bulk loads without datetimes skip adapting
+            if any(isinstance(value, datetime.datetime) for value in first):
+                rows = map(_adapt, rows)
+        self._cursor.executemany(_sqlite_sql(sql), rows)
+        self._timestamps = ()
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return row if row is None or not self._timestamps else self._convert(row)
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        return rows if not self._timestamps else [self._convert(row) for row in rows]
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        return rows if not self._timestamps else [self._convert(row) for row in rows]
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class SQLiteConnection:
+    """A sqlite3 connection with the parts of the pymysql API the scripts use.
+
+    sqlite3 cursors already step through results lazily, so a cursor class
+    such as pymysql.cursors.SSCursor passed to cursor() is ignored.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, cursorclass=None):
+        return SQLiteCursor(self._conn.cursor())
+
+    def get_autocommit(self):
+        return self._conn.isolation_level is None
+
+    def autocommit(self, value):
+        self._conn.isolation_level = None if value else "DEFERRED"
+
+    def close(self):
+        self._conn.close()
+
+    def discard(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class MySQLBackend:
+    """The ALX_prodev MySQL database, through the shared connection pool."""
+
+    name = "mysql"
+
+    def __init__(self, database=db_pool.DB_NAME):
+        self.database = database
+
+    def connect(self):
+        return db_pool.connect(self.database)
+
+    def connect_server(self):
+        return db_pool.connect(None)
+
+
+class SQLiteBackend:
+    """A local SQLite database file tuned for scans."""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            age NUMERIC NOT NULL,
+            created_at TIMESTAMP NOT NULL
+                DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'),
+            updated_at TIMESTAMP NOT NULL
+                DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_email ON user_data (email);
+        CREATE INDEX IF NOT EXISTS idx_age ON user_data (age);
+        CREATE INDEX IF NOT EXISTS idx_created ON user_data (created_at, user_id);
+        CREATE INDEX IF NOT EXISTS idx_updated ON user_data (updated_at, user_id);
+        CREATE TRIGGER IF NOT EXISTS user_data_updated_at
+        AFTER UPDATE ON user_data WHEN NEW.updated_at = OLD.updated_at
+        BEGIN
+            UPDATE user_data
+            SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'
+            WHERE user_id = NEW.user_id;
+        END;
+    """
+
+    def __init__(self, path=None, cache_kb=SQLITE_CACHE_KB, mmap_bytes=SQLITE_MMAP_BYTES,
+                 wal=True, timeout=30.0):
+        self.path = path or SQLITE_PATH or f"{db_pool.DB_NAME}.sqlite3"
+        self.cache_kb = cache_kb
+        self.mmap_bytes = mmap_bytes
+        self.wal = wal
+        self.timeout = timeout
+
+    def connect(self):
+        """Open a connection in autocommit mode, like the pooled MySQL ones."""
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.wal:
+            # readers never block the writer (or each other) in WAL mode, and
+            # NORMAL sync is crash-safe there
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return SQLiteConnection(conn)
+
+    connect_server = connect  # the file is both the server and the database
+
+    def create_table(self, connection):
+        connection.executescript(self.SCHEMA)
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+
+_current = None
+
+
+def create(name=BACKEND, database=None):
+    """Return a backend by name, for `database` (a MySQL schema or SQLite stem)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name!r}")
+    if database is None:
+        return BACKENDS[name]()
+    if name == "sqlite":
+        return SQLiteBackend(f"{database}.sqlite3")
+    return MySQLBackend(database)
+
+
+def current():
+    """Return the backend the scripts connect through."""
+    global _current
+    if _current is None:
+        _current = create()
+    return _current
+
+
+def use(backend):
+    """Switch every script to `backend` (a backend object or a name)."""
+    global _current
+    _current = create(backend) if isinstance(backend, str) else backend
+    return _current
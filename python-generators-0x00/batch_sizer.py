@@ -0,0 +1,77 @@
+"""
+Adaptive fetch sizing for stream_users_in_batches.
+
+The sizer watches how long each fetch takes and how large the rows are,
+and picks the next batch size so that one batch takes about
+`target_seconds` to fetch and stays under `memory_budget` bytes. Changes
+made for speed are limited to 2x per batch; the memory budget applies at
+once (only `minimum` overrides it).
+"""
+import sys
+from collections import deque
+
+HISTORY = 64
+
+
+def estimate_row_bytes(row):
+    """Approximate in-memory size of one fetched row tuple."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+class AdaptiveBatchSize:
+    """Batch size controller; read `size` before a fetch, `observe()` after."""
+
+    def __init__(self, initial=1000, target_seconds=0.05, memory_budget=8 * 1024 * 1024,
+                 minimum=10, maximum=100_000, smoothing=0.3):
+        self.size = initial
+        self.target_seconds = target_seconds
+        self.memory_budget = memory_budget
+        self.minimum = minimum
+        self.maximum = maximum
+        self.smoothing = smoothing
+        self.row_seconds = None
+        self.row_bytes = None
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.history = deque(maxlen=HISTORY)
+
+    def _smooth(self, previous, sample):
+        if previous is None:
+            return sample
+        return previous + self.smoothing * (sample - previous)
+
+    def observe(self, rows, seconds, row_bytes):
+        """Record one fetch of `rows` rows and choose the next size."""
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+        self.history.append((rows, seconds))
+        if not rows:
+            return self.size
+        self.row_seconds = self._smooth(self.row_seconds, seconds / rows)
+        self.row_bytes = self._smooth(self.row_bytes, row_bytes)
+        wanted = self.maximum
+        if self.row_seconds > 0:
+            wanted = self.target_seconds / self.row_seconds
+        # move at most 2x per step so one noisy fetch cannot swing the size
+        wanted = max(self.size / 2, min(self.size * 2, wanted))
+        # the memory budget is a hard cap, applied after the step clamp
+        if self.row_bytes > 0:
+            wanted = min(wanted, self.memory_budget / self.row_bytes)
+        self.size = int(max(self.minimum, min(self.maximum, wanted)))
+        return self.size
+
+    @property
+    def metrics(self):
+        """Counters and recent (rows, seconds) fetches, for logging or dashboards."""
+        return {
+            "size": self.size,
+            "batches": self.batches,
+            "rows": self.rows,
+            "seconds": self.seconds,
+            "rows_per_second": self.rows / self.seconds if self.seconds else None,
+            "row_seconds": self.row_seconds,
+            "row_bytes": self.row_bytes,
+            "recent": list(self.history),
+        }
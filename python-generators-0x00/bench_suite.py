@@ -0,0 +1,269 @@
+#!/usr/bin/python3
+"""
+Reproducible benchmark suite for the user_data generators.
+
+    python bench_suite.py --rows 100000 --report bench.json
+    python bench_suite.py --rows 10000000 --repeat 3 stream_users lazy_paginate
+    python bench_suite.py --backend mysql --backend sqlite   # compare backends
+
+`--rows` synthetic users are loaded into a separate benchmark database
+(ALX_prodev_bench by default, so the real data is never touched) on each
+`--backend`; a database that already holds exactly that many rows is
+reused. Each generator then runs in a fresh subprocess, so every
+measurement starts with a cold pool and its own peak RSS, and records:
+
+    rows_per_sec       rows yielded per second over the whole scan
+    time_to_first_row  seconds from the call to the first yielded item
+    round_trips        commands sent to the server (queries, pings, ...);
+                       null for SQLite, which runs in-process
+    peak_rss_kb        peak RSS of the run, next to the peak after imports
+
+The report is JSON: run metadata (rows, batch size, Python, git revision)
+plus every run and the median run per backend and generator, for
+regression tracking.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import pymysql
+
+import backends
+from benchmarks import iter_synthetic_rows
+
+seed = __import__('seed')
+
+BENCH_DB = "ALX_prodev_bench"
+LOAD_BATCH = 10_000
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+
+def _one(_):
+    return 1
+
+
+# name -> (generator call, number of rows in one yielded item)
+GENERATORS = {
+    "stream_users": (lambda batch_size: stream_users(), _one),
+    "stream_users_in_batches": (lambda batch_size: stream_users_in_batches(batch_size), len),
+    "lazy_paginate": (lambda batch_size: lazy_paginate(batch_size), len),
+    "stream_user_ages": (lambda batch_size: stream_user_ages(), _one),
+}
+
+
+def load_dataset(rows, database=BENCH_DB, backend="mysql", seed_value=0):
+    """Fill `database`.user_data with `rows` synthetic users unless it already has them."""
+    backend = backends.use(backends.create(backend, database))
+    if backend.name == "mysql":
+        server = backend.connect_server()
+        try:
+            with server.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        finally:
+            server.close()
+    connection = backend.connect()
+    try:
+        seed.create_table(connection)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            (present,) = cursor.fetchone()
+            if present == rows:
+                print(f"Reusing {backend.name} {database} with {rows} rows")
+                return
+            cursor.execute("TRUNCATE TABLE user_data" if backend.name == "mysql"
+                           else "DELETE FROM user_data")
+            started = time.perf_counter()
+            connection.autocommit(False)
+            batch = []
+            for row in iter_synthetic_rows(rows, seed_value):
+                batch.append(row)
+                if len(batch) == LOAD_BATCH:
+                    cursor.executemany(seed.INSERT_SQL, batch)
+                    connection.commit()
+                    batch = []
+            if batch:
+                cursor.executemany(seed.INSERT_SQL, batch)
+                connection.commit()
+        print(f"Loaded {rows} rows into {backend.name} {database} in {time.perf_counter() - started:.1f}s")
+    finally:
+        connection.close()
+
+
+def _peak_rss_kb():
+    # Linux carries ru_maxrss over from the parent across exec, so prefer the
+    # high-water mark of this process's own address space
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+
+def _count_round_trips():
+    """Count commands pymysql sends from now on; returns a reader for the count.
+
+    Every query, ping and autocommit switch goes through
+    Connection._execute_command, and each is one request/response with the
+    server. Rows of an unbuffered result streamed by fetchmany() are not
+    extra round trips. Returns a reader of None when the current backend is
+    not MySQL or pymysql has no such hook.
+    """
+    if backends.current().name != "mysql":
+        return lambda: None
+    connection_class = getattr(getattr(pymysql, "connections", None), "Connection", None)
+    original = getattr(connection_class, "_execute_command", None)
+    if original is None:
+        return lambda: None
+    calls = [0]
+
+    def counting(self, command, sql):
+        calls[0] += 1
+        return original(self, command, sql)
+
+    connection_class._execute_command = counting
+    return lambda: calls[0]
+
+
+def measure(name, batch_size):
+    """Run one generator to exhaustion in this process and return its metrics."""
+    backend = backends.current()
+    call, count = GENERATORS[name]
+    round_trips = _count_round_trips()
+    baseline = _peak_rss_kb()
+    rows = 0
+    first = None
+    started = time.perf_counter()
+    for item in call(batch_size):
+        if first is None:
+            first = time.perf_counter() - started
+        rows += count(item)
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": backend.name,
+        "generator": name,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else None,
+        "time_to_first_row": first,
+        "round_trips": round_trips(),
+        "peak_rss_kb": _peak_rss_kb(),
+        "baseline_rss_kb": baseline,
+    }
+
+
+def _run_isolated(name, batch_size, database, backend):
+    """Run measure() in a fresh interpreter pointed at `database` on `backend`."""
+    env = dict(os.environ, DB_NAME=database, DB_BACKEND=backend)
+    env.pop("DB_SQLITE_PATH", None)  # the SQLite file follows DB_NAME
+    done = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name,
+         "--batch-size", str(batch_size)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    # generators report database errors on stdout; the metrics come last
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(medians):
+    """Print each backend's median rows/s relative to the first backend's."""
+    first, *others = medians
+    for other in others:
+        for name, run in medians[other].items():
+            base = medians[first].get(name, {}).get("rows_per_sec")
+            if base and run["rows_per_sec"]:
+                print(f"{name:<24} {other} / {first}: {run['rows_per_sec'] / base:6.2f}x")
+
+
+def run_suite(rows, generators=None, batch_size=1000, repeat=1, database=BENCH_DB,
+              report=None, backend_names=("mysql",)):
+    """Load the dataset, benchmark each generator `repeat` times and return the report."""
+    runs = []
+    medians = {}
+    for backend in backend_names:
+        load_dataset(rows, database, backend)
+        medians[backend] = {}
+        for name in generators or GENERATORS:
+            results = [_run_isolated(name, batch_size, database, backend)
+                       for _ in range(repeat)]
+            runs.extend(results)
+            rates = [result["rows_per_sec"] or 0 for result in results]
+            median = results[rates.index(statistics.median_low(rates))]
+            medians[backend][name] = median
+            print(f"{backend:<7} {name:<24} {median['rows']:>10} rows  "
+                  f"{median['rows_per_sec'] or 0:>12,.0f} rows/s  "
+                  f"first {median['time_to_first_row'] or 0:7.4f}s  "
+                  f"{median['round_trips'] if median['round_trips'] is not None else '-':>6} trips  "
+                  f"{median['peak_rss_kb']:>8} KB peak")
+    _compare(medians)
+    result = {
+        "meta": {
+            "rows": rows,
+            "batch_size": batch_size,
+            "repeat": repeat,
+            "database": database,
+            "backends": list(backend_names),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "revision": _git_revision(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "median": medians,
+        "runs": runs,
+    }
+    if report:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {report}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("generators", nargs="*",
+                        help=f"generators to run (default: all of {', '.join(GENERATORS)})")
+    parser.add_argument("--rows", type=int, default=100_000,
+                        help="synthetic users in the benchmark database")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per generator")
+    parser.add_argument("--database", default=BENCH_DB)
+    parser.add_argument("--backend", action="append", choices=sorted(backends.BACKENDS),
+                        help="backend to benchmark; repeat to compare (default: mysql)")
+    parser.add_argument("--report", default="bench_report.json",
+                        help="path of the JSON report")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    unknown = set(args.generators) - set(GENERATORS)
+    if unknown:
+        parser.error(f"unknown generators: {', '.join(sorted(unknown))}")
+    if args.child:
+        print(json.dumps(measure(args.child, args.batch_size)))
+        return
+    run_suite(args.rows, args.generators, args.batch_size, args.repeat, args.database,
+              args.report, args.backend or ["mysql"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+"""
+Throughput benchmarks for the user_data generator pipeline.
+
+    python benchmarks.py columnar          # against the ALX_prodev database
+    python benchmarks.py columnar --offline  # synthetic rows, no database
+    python benchmarks.py row-memory        # bytes per row held in a batch
+    python benchmarks.py pipeline [--offline]  # pipeline DSL vs hand-written loops
+    python benchmarks.py ingest            # CSV parse stage of seed ingest
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import ingest
+from aggregate import StreamingStats, aggregate
+from pipeline import source
+from query import compile_filter, select_columns
+from rows import ROW_FORMATS, convert_rows, numpy, to_columns
+
+seed = __import__('seed')
+stream_users = __import__('0-stream_users').stream_users
+batch_processing = __import__('1-batch_processing').batch_processing
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+COLUMNS = ("user_id", "name", "email", "age")
+
+
+def iter_synthetic_rows(count, seed=0):
+    """Yield `count` user_data-shaped row tuples; the same `seed` gives the same rows."""
+    rng = random.Random(seed)
+    names = [f"User {i}" for i in range(500)]
+    for i in range(count):
+        yield (str(uuid.UUID(int=rng.getrandbits(128), version=4)), rng.choice(names),
+               f"user{i}@example.com", rng.randint(1, 100))
+
+
+def synthetic_rows(count, seed=0):
+    """Return `count` user_data-shaped row tuples."""
+    return list(iter_synthetic_rows(count, seed))
+
+
+def _rate(rows, seconds):
+    return rows / seconds if seconds else float("inf")
+
+
+def _timed(label, run):
+    started = time.perf_counter()
+    rows = run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {rows:>10} rows  {elapsed:8.3f}s  {_rate(rows, elapsed):>12,.0f} rows/s")
+    return rows, elapsed
+
+
+def bench_columnar(batch_size=1000, rows=200_000, offline=False):
+    """Aggregate ages through dict batches versus columnar batches."""
+    if offline:
+        data = synthetic_rows(rows)
+
+        def batches(columnar=None):
+            for start in range(0, len(data), batch_size):
+                chunk = data[start:start + batch_size]
+                if columnar:
+                    yield to_columns(chunk, COLUMNS, columnar)
+                else:
+                    yield [dict(zip(COLUMNS, row)) for row in chunk]
+    else:
+        def batches(columnar=None):
+            return stream_users_in_batches(batch_size, columnar=columnar)
+
+    def dict_path():
+        stats = StreamingStats()
+        for batch in batches():
+            for user in batch:
+                stats.update(user["age"])
+        return stats.count
+
+    def columnar_path(kind):
+        def run():
+            stats = StreamingStats()
+            for batch in batches(kind):
+                stats.update_many(batch["age"])
+            return stats.count
+        return run
+
+    results = {"dict": _timed("dict", dict_path)}
+    results["array"] = _timed("columnar/array", columnar_path("array"))
+    if numpy is not None:
+        results["numpy"] = _timed("columnar/numpy", columnar_path("numpy"))
+    return results
+
+
+def bench_row_memory(batch_size=1000, rows=200_000, offline=True):
+    """Bytes per row that each row format holds on top of the field values.
+
+    The field values are shared by every format, so only the per-row
+    container (dict, tuple, record) and its slot in the batch list count.
+    """
+    data = synthetic_rows(batch_size)
+    results = {}
+    for row_format in ROW_FORMATS:
+        batch = convert_rows(list(data), COLUMNS, row_format)
+        held = sys.getsizeof(batch) + sum(sys.getsizeof(row) for row in batch)
+        results[row_format] = held / len(batch)
+        print(f"{row_format:<8} {results[row_format]:8.1f} bytes/row")
+    return results
+
+
+def _synthetic_source(data, batch_size):
+    """A stand-in for stream_users_in_batches that filters like the server would."""
+    def stream(columns=None, where=None):
+        names = select_columns(columns)
+        indexes = [COLUMNS.index(name) for name in names]
+        predicate = compile_filter(where, COLUMNS)
+        for start in range(0, len(data), batch_size):
+            chunk = data[start:start + batch_size]
+            if predicate:
+                chunk = [row for row in chunk if predicate(row)]
+            yield [dict(zip(names, (row[i] for i in indexes))) for row in chunk]
+    return stream
+
+
+def bench_pipeline(batch_size=1000, rows=200_000, offline=False):
+    """The pipeline DSL against the hand-written batch_processing / average scripts."""
+    if offline:
+        stream = _synthetic_source(synthetic_rows(rows), batch_size)
+
+        def hand_filter():
+            # the pre-pushdown batch_processing loop
+            return sum(1 for batch in stream() for user in batch if user["age"] > 25)
+
+        def hand_average():
+            return aggregate(user["age"] for batch in stream() for user in batch).count
+
+        batches, users = stream, stream
+    else:
+        def hand_filter():
+            return sum(1 for _ in batch_processing(batch_size))
+
+        def hand_average():
+            return aggregate(stream_user_ages()).count
+
+        def batches(**kwargs):
+            return stream_users_in_batches(batch_size, **kwargs)
+        users = stream_users
+
+    results = {
+        "filter/hand": _timed("filter/hand", hand_filter),
+        "filter/pipeline": _timed(
+            "filter/pipeline",
+            lambda: sum(1 for _ in source(batches).where("age", ">", 25))),
+        "average/hand": _timed("average/hand", hand_average),
+        "average/pipeline": _timed(
+            "average/pipeline",
+            lambda: source(users).select("age").agg("age").count),
+    }
+    return results
+
+
+def _row_parse_baseline(path):
+    """The per-row parse seed.insert_data used before ingest.py."""
+    read = 0
+    values = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            read += 1
+            name, email, age = row["name"].strip(), row["email"].strip(), row["age"]
+            try:
+                valid_age = float(age) >= 0
+            except ValueError:
+                valid_age = False
+            if name and "@" in email and valid_age:
+                values.append((str(uuid.uuid4()), name, email, age))
+    return read
+
+
+def bench_ingest(batch_size=1000, rows=200_000, offline=True):
+    """Parse stage of seed ingest: per-row csv.DictReader versus ingest.parse_block."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user_data.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator="\n")
+            writer.writerow(ingest.FIELDS)
+            writer.writerows(row[1:] for row in iter_synthetic_rows(rows))
+
+        def block_parse():
+            header, [(start, end)] = seed._partition_csv(path, 1)
+            return sum(ingest.parse_block(block, header)[1]
+                       for block in ingest.read_blocks(path, start, end))
+
+        return {
+            "row": _timed("parse/row", lambda: _row_parse_baseline(path)),
+            "block": _timed("parse/block", block_parse),
+        }
+
+
+BENCHMARKS = {
+    "columnar": bench_columnar,
+    "row-memory": bench_row_memory,
+    "pipeline": bench_pipeline,
+    "ingest": bench_ingest,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=200_000,
+                        help="synthetic row count for --offline runs")
+    parser.add_argument("--offline", action="store_true",
+                        help="use synthetic in-memory rows instead of the database")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](batch_size=args.batch_size, rows=args.rows, offline=args.offline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Checkpoints for long scans over user_data.
+
+A checkpoint file records the user_id of the last fully processed row plus
+any partial state (e.g. StreamingStats.to_dict()). Scans read it on start
+and continue with a keyset seek after that user_id instead of starting
+over from the first row.
+"""
+import json
+import os
+import time
+
+SAVE_INTERVAL = 10.0  # seconds between saves during a scan
+
+
+class Checkpoint:
+    """A JSON checkpoint file that is replaced atomically on every save."""
+
+    def __init__(self, path, interval=SAVE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._saved_at = time.monotonic()
+
+    def load(self):
+        """Return {"last_user_id", "rows", "state"} or None when absent."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, last_user_id, rows, state=None):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"last_user_id": last_user_id, "rows": rows, "state": state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+
+    def due(self):
+        """True once `interval` seconds have passed since the last save."""
+        return time.monotonic() - self._saved_at >= self.interval
+
+    def clear(self):
+        """Remove the checkpoint once a scan has completed."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def as_checkpoint(checkpoint):
+    """Accept a Checkpoint or a path to one."""
+    if isinstance(checkpoint, Checkpoint):
+        return checkpoint
+    return Checkpoint(checkpoint)
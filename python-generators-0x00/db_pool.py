@@ -0,0 +1,220 @@
+"""
+Shared pool of pymysql connections for the python-generators-0x00 scripts.
+
+Connection settings come from the environment (DB_HOST, DB_USER,
+DB_PASSWORD, DB_NAME, DB_POOL_SIZE). Each process keeps one pool per
+database; connections handed out by the pool are returned to it by
+calling close() on them, so existing code that opens and closes a
+connection per call reuses warm connections without changes.
+"""
+import os
+import threading
+import time
+
+import pymysql
+
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_NAME = os.getenv("DB_NAME", "ALX_prodev")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# idle connections older than this are pinged before being handed out
+HEALTH_CHECK_AFTER = 30.0
+
+
+def _has_unread_result(conn):
+    result = getattr(conn, "_result", None)
+    return bool(result is not None and getattr(result, "unbuffered_active", False))
+
+
+class PooledConnection:
+    """A pooled pymysql connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+    def discard(self):
+        """Close the underlying connection instead of returning it."""
+        if self._conn is not None:
+            self._pool.release(self._conn, discard=True)
+            self._conn = None
+
+    def __del__(self):
+        # dropped without close(): don't hand a connection in unknown state back
+        if self._conn is not None:
+            self._pool.release(self._conn, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of connections to one database."""
+
+    def __init__(self, database=DB_NAME, max_size=POOL_SIZE, timeout=30.0,
+                 health_check_after=HEALTH_CHECK_AFTER):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = []  # (connection, released_at), most recent last
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "waits": 0,
+            "failed_health_checks": 0,
+        }
+
+    def _connect(self):
+        return pymysql.connect(
+            host=DB_HOST,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            database=self.database,
+            charset="utf8mb4",
+            cursorclass=pymysql.cursors.Cursor,
+            autocommit=True,
+        )
+
+    def _healthy(self, conn, released_at):
+        if not conn.open:
+            return False
+        if time.monotonic() - released_at < self.health_check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except pymysql.MySQLError:
+            return False
+
+    def _drop(self, conn):
+        try:
+            conn.close()
+        except pymysql.MySQLError:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._counters["discarded"] += 1
+            self._cond.notify()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError(f"Connection pool for {self.database} is closed")
+
+    def acquire(self):
+        """Return a PooledConnection, waiting up to `timeout` seconds for one."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                self._check_open()
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free connection to {self.database} "
+                                           f"after {self.timeout}s")
+                    self._counters["waits"] += 1
+                    self._cond.wait(remaining)
+                    self._check_open()
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                else:
+                    conn, released_at = None, None
+                    self._open += 1
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._counters["created"] += 1
+                return PooledConnection(self, conn)
+            if self._healthy(conn, released_at):
+                with self._cond:
+                    self._counters["reused"] += 1
+                return PooledConnection(self, conn)
+            with self._cond:
+                self._counters["failed_health_checks"] += 1
+            self._drop(conn)
+
+    def release(self, conn, discard=False):
+        """Return a raw connection to the pool, or close it if it is unusable."""
+        if discard or not conn.open or _has_unread_result(conn):
+            self._drop(conn)
+            return
+        try:
+            if not conn.get_autocommit():
+                conn.rollback()
+                conn.autocommit(True)
+        except pymysql.MySQLError:
+            self._drop(conn)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._drop(conn)
+
+    def close(self):
+        """Close every idle connection; connections in use close on release.
+
+        acquire() on a closed pool raises RuntimeError.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._drop(conn)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, open=self._open, idle=len(self._idle),
+                        max_size=self.max_size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database=DB_NAME):
+    """Return this process's pool for `database` (None for a server connection)."""
+    key = (os.getpid(), database)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = ConnectionPool(database)
+        return pool
+
+
+def connect(database=DB_NAME):
+    """Borrow a connection from the shared pool; close() returns it."""
+    return get_pool(database).acquire()
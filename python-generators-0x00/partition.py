@@ -0,0 +1,164 @@
+"""
+Scan user_data in parallel: the user_id key space is cut into contiguous
+ranges and every range is read by its own worker process and connection.
+
+user_id holds random UUID4 strings, so equal slices of the hex key space
+give partitions of roughly equal size.
+"""
+import multiprocessing
+import os
+from queue import Empty
+
+import pymysql
+
+from aggregate import StreamingStats
+from query import build_select, select_columns
+
+seed = __import__('seed')
+
+KEY_SPACE = 16 ** 8  # first 8 hex digits of a UUID
+POLL_SECONDS = 1.0  # how often a waiting consumer checks its workers are alive
+
+
+def key_ranges(partitions):
+    """Return `partitions` [low, high) user_id ranges covering the whole table.
+
+    The first low and the last high are None (unbounded).
+    """
+    bounds = [format(KEY_SPACE * i // partitions, "08x") for i in range(1, partitions)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def _range_filter(where, low, high):
+    where = list(where or ())
+    if low is not None:
+        where.append(("user_id", ">=", low))
+    if high is not None:
+        where.append(("user_id", "<", high))
+    return where
+
+
+def _connect():
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        raise ConnectionError(f"Could not connect to {seed.DB_NAME}")
+    return connection
+
+
+def _scan_worker(index, low, high, columns, where, ordered, batch_size, queue):
+    """Worker: stream one key range into `queue` as ("rows" | "done" | "error") messages."""
+    try:
+        connection = _connect()
+        try:
+            with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+                order_by = "user_id" if ordered else None
+                cursor.execute(*build_select(columns, _range_filter(where, low, high), order_by))
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    queue.put((index, "rows", rows))
+        finally:
+            connection.close()
+        queue.put((index, "done", None))
+    except Exception as e:
+        queue.put((index, "error", repr(e)))
+
+
+def _drain(queue, workers, columns):
+    """Yield rows from `queue` until every worker in {index: process} is done.
+
+    Raises RuntimeError if a worker dies (e.g. killed by the OOM killer)
+    before it reports "done" or "error".
+    """
+    pending = dict(workers)
+    suspects = set()
+    while pending:
+        try:
+            index, kind, payload = queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            dead = {index for index, worker in pending.items() if not worker.is_alive()}
+            # a worker's last messages can still be in the pipe just after it
+            # exits, so only give up on one found dead on two polls in a row
+            lost = sorted(dead & suspects)
+            if lost:
+                raise RuntimeError(f"Partition {lost[0]} worker exited with code "
+                                   f"{pending[lost[0]].exitcode} before finishing")
+            suspects = dead
+            continue
+        if kind == "done":
+            del pending[index]
+        elif kind == "error":
+            raise RuntimeError(f"Partition {index} failed: {payload}")
+        else:
+            for row in payload:
+                yield dict(zip(columns, row))
+
+
+def parallel_scan(partitions=None, columns=None, where=None, ordered=False,
+                  batch_size=1000, queue_depth=4):
+    """Generator over user_data rows read concurrently by `partitions` processes.
+
+    Rows are yielded one at a time as dicts. Unordered mode yields the rows
+    of each batch as soon as any worker produces it; ordered mode yields
+    rows in user_id order by draining the ranges one after the other while
+    later workers fill their own bounded queues.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    columns = select_columns(columns)
+    ranges = key_ranges(partitions)
+    if ordered:
+        queues = [multiprocessing.Queue(queue_depth) for _ in ranges]
+    else:
+        queues = [multiprocessing.Queue(queue_depth * partitions)] * partitions
+    workers = [
+        multiprocessing.Process(
+            target=_scan_worker,
+            args=(index, low, high, columns, where, ordered, batch_size, queues[index]),
+            daemon=True,
+        )
+        for index, (low, high) in enumerate(ranges)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        if ordered:
+            for index, queue in enumerate(queues):
+                yield from _drain(queue, {index: workers[index]}, columns)
+        else:
+            yield from _drain(queues[0], dict(enumerate(workers)), columns)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+def _aggregate_worker(task):
+    """Worker: fold one column of one key range into a StreamingStats."""
+    column, low, high, where = task
+    stats = StreamingStats()
+    connection = _connect()
+    try:
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(*build_select([column], _range_filter(where, low, high)))
+            for (value,) in cursor:
+                stats.update(value)
+    finally:
+        connection.close()
+    return stats
+
+
+def parallel_aggregate(column, partitions=None, where=None):
+    """Aggregate `column` over user_data with one process per key range.
+
+    Each worker returns a partial StreamingStats; the partials are merged
+    as they complete.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    tasks = [(column, low, high, where) for low, high in key_ranges(partitions)]
+    stats = StreamingStats()
+    with multiprocessing.Pool(partitions) as pool:
+        for partial in pool.imap_unordered(_aggregate_worker, tasks):
+            stats.merge(partial)
+    return stats
@@ -0,0 +1,131 @@
+"""
+A small lazy pipeline over the user_data generators.
+
+    stats = (source(stream_users)
+             .where("age", ">", 25)
+             .select("name", "age")
+             .agg("age"))
+
+Nothing runs until the pipeline is iterated or aggregated. Filters given as
+(column, operator, value) and the final projection are pushed down into
+SQL when the source generator accepts `where` / `columns` arguments;
+everything else runs in a single loop over the rows, with no intermediate
+generators or lists between stages. Sources that yield batches (lists of
+rows) are flattened.
+"""
+import inspect
+
+from aggregate import StreamingStats
+from query import compile_filter
+
+
+def _column_filter(column, operator, value):
+    test = compile_filter([(column, operator, value)], [column])
+    return lambda row: test((row[column],))
+
+
+class Pipeline:
+    """Lazy description of a scan; build with source() and chain stages."""
+
+    def __init__(self, generator, kwargs, stages=(), batch_size=None):
+        self._generator = generator
+        self._kwargs = kwargs
+        self._stages = list(stages)
+        self._batch_size = batch_size
+
+    def _with(self, stage=None, batch_size=None):
+        stages = self._stages + [stage] if stage else self._stages
+        return Pipeline(self._generator, self._kwargs, stages,
+                        batch_size or self._batch_size)
+
+    def where(self, column, operator=None, value=None):
+        """Keep rows matching (column, operator, value) or a predicate(row)."""
+        if callable(column):
+            return self._with(("predicate", column))
+        return self._with(("filter", (column, operator, value)))
+
+    def select(self, *columns):
+        """Keep only `columns` in every row."""
+        return self._with(("select", list(columns)))
+
+    def batch(self, size):
+        """Yield lists of `size` rows instead of single rows."""
+        return self._with(batch_size=size)
+
+    def _accepts(self, name):
+        try:
+            return name in inspect.signature(self._generator).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def plan(self):
+        """Return (source kwargs, Python stages) after pushdown."""
+        kwargs = dict(self._kwargs)
+        pushed = list(kwargs.get("where") or ())
+        stages = []
+        can_push_where = self._accepts("where")
+        for kind, arg in self._stages:
+            if kind == "filter" and can_push_where:
+                # a column filter on the base table commutes with projections
+                pushed.append(arg)
+            elif kind == "filter":
+                stages.append(("predicate", _column_filter(*arg)))
+            else:
+                stages.append((kind, arg))
+        if pushed:
+            kwargs["where"] = pushed
+        selects = [arg for kind, arg in stages if kind == "select"]
+        if selects and self._accepts("columns"):
+            if not any(kind == "predicate" for kind, _ in stages):
+                # only the last projection survives; fetch just those columns
+                kwargs["columns"] = selects[-1]
+                stages = [(kind, arg) for kind, arg in stages if kind != "select"]
+        return kwargs, stages
+
+    def _rows(self):
+        kwargs, stages = self.plan()
+        steps = [
+            (kind == "predicate",
+             arg if kind == "predicate" else (lambda row, cols=arg: {c: row[c] for c in cols}))
+            for kind, arg in stages
+        ]
+        for item in self._generator(**kwargs):
+            for row in item if isinstance(item, list) else (item,):
+                for is_filter, step in steps:
+                    if is_filter:
+                        if not step(row):
+                            break
+                    else:
+                        row = step(row)
+                else:
+                    yield row
+
+    def __iter__(self):
+        if not self._batch_size:
+            return self._rows()
+        return self._batches()
+
+    def _batches(self):
+        batch = []
+        for row in self._rows():
+            batch.append(row)
+            if len(batch) == self._batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def agg(self, column, stats=None):
+        """Run the pipeline and fold `column` into a StreamingStats."""
+        stats = stats if stats is not None else StreamingStats()
+        for row in self._rows():
+            stats.update(row[column])
+        return stats
+
+
+def source(generator, **kwargs):
+    """Start a pipeline over a generator function such as stream_users.
+
+    `kwargs` are passed to the generator (e.g. batch_size=1000).
+    """
+    return Pipeline(generator, kwargs)
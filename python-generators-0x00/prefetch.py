@@ -0,0 +1,60 @@
+"""
+Double-buffering for batch generators: a background thread fetches the
+next batches while the consumer is still working on the current one, so
+network waits and processing overlap instead of taking turns.
+"""
+import queue
+import threading
+
+POLL_SECONDS = 0.1
+
+
+def _put(items, message, stop):
+    """Put `message` unless asked to stop first; returns False when stopped."""
+    while not stop.is_set():
+        try:
+            items.put(message, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetched(batches, depth=1):
+    """Yield the items of `batches`, reading up to `depth` items ahead.
+
+    The source iterator is advanced and closed only by the background
+    thread. If the consumer stops early (e.g. islice, break), the thread
+    is signalled, closes the source and is joined before this generator
+    finishes closing.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in batches:
+                if not _put(items, ("item", item), stop):
+                    break
+            else:
+                _put(items, ("done", None), stop)
+        except Exception as e:
+            _put(items, ("error", e), stop)
+        finally:
+            close = getattr(batches, "close", None)
+            if close is not None:
+                close()
+
+    worker = threading.Thread(target=produce, name="prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, payload = items.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise payload
+            yield payload
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,106 @@
+"""
+Compile column lists and filters into parameterised SELECTs on user_data,
+so generators only pull the rows and columns they actually need.
+
+A filter is a list of (column, operator, value) triples that are ANDed:
+
+    [("age", ">", 25), ("email", "LIKE", "%@gmail.com")]
+"""
+import re
+
+TABLE = "user_data"
+COLUMNS = ("user_id", "name", "email", "age")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "LIKE", "IN")
+_COMPARE = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _check_column(column):
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown column: {column!r}")
+    return column
+
+
+def select_columns(columns=None):
+    """Return the validated column list, defaulting to every column."""
+    if not columns:
+        return list(COLUMNS)
+    return [_check_column(column) for column in columns]
+
+
+def build_where(where=None, placeholder="%s"):
+    """Return (sql, params) for a WHERE clause, or ("", []) for no filter."""
+    clauses = []
+    params = []
+    for column, operator, value in where or ():
+        _check_column(column)
+        operator = operator.upper()
+        if operator not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator!r}")
+        if operator == "IN":
+            values = list(value)
+            if not values:
+                clauses.append("1 = 0")
+                continue
+            marks = ", ".join([placeholder] * len(values))
+            clauses.append(f"{column} IN ({marks})")
+            params.extend(values)
+        else:
+            clauses.append(f"{column} {operator} {placeholder}")
+            params.append(value)
+    if not clauses:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def build_select(columns=None, where=None, order_by=None, limit=None, placeholder="%s"):
+    """Return (sql, params) selecting `columns` from user_data under `where`."""
+    sql = f"SELECT {', '.join(select_columns(columns))} FROM {TABLE}"
+    where_sql, params = build_where(where, placeholder)
+    sql += where_sql
+    if order_by:
+        sql += f" ORDER BY {_check_column(order_by)}"
+    if limit is not None:
+        sql += f" LIMIT {placeholder}"
+        params.append(limit)
+    return sql, params
+
+
+def _like_pattern(pattern):
+    parts = (".*" if char == "%" else "." if char == "_" else re.escape(char)
+             for char in pattern)
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def compile_filter(where, column_names):
+    """Return a Python predicate over row tuples equivalent to `where`.
+
+    Used where rows come from somewhere other than MySQL (e.g. a local
+    snapshot); returns None when there is nothing to filter.
+    """
+    tests = []
+    for column, operator, value in where or ():
+        index = list(column_names).index(_check_column(column))
+        operator = operator.upper()
+        if operator == "LIKE":
+            match = _like_pattern(value).fullmatch
+            tests.append(lambda row, i=index, m=match: m(str(row[i])) is not None)
+        elif operator == "IN":
+            values = set(value)
+            tests.append(lambda row, i=index, v=values: row[i] in v)
+        elif operator in _COMPARE:
+            compare = _COMPARE[operator]
+            tests.append(lambda row, i=index, c=compare, v=value: c(row[i], v))
+        else:
+            raise ValueError(f"Unsupported operator: {operator!r}")
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+    return lambda row: all(test(row) for test in tests)
@@ -0,0 +1,70 @@
+"""
+Row layouts for the user_data generators.
+
+Rows can be yielded as dicts (the default), plain tuples, or namedtuple
+records, which keep the size of a tuple but add attribute access
+(`row.age`). `ROW_FORMATS` lists the accepted names.
+
+A columnar batch maps each column name to all of its values for the batch:
+numeric columns become `array('d')` (or a NumPy array when available and
+requested) and text columns become lists of interned strings, so filters
+and aggregates can work on whole columns instead of per-row dicts.
+"""
+import sys
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional
+    numpy = None
+
+NUMERIC_COLUMNS = ("age",)
+ROW_FORMATS = ("dict", "tuple", "record")
+
+
+@lru_cache(maxsize=None)
+def record_type(column_names):
+    """Return the namedtuple class for a tuple of column names."""
+    return namedtuple("UserRecord", column_names)
+
+
+def convert_rows(rows, column_names, row_format="dict"):
+    """Convert a list of row tuples into `row_format` rows."""
+    if row_format == "dict":
+        return [dict(zip(column_names, row)) for row in rows]
+    if row_format == "tuple":
+        return rows if isinstance(rows, list) else list(rows)
+    if row_format == "record":
+        make = record_type(tuple(column_names))._make
+        return [make(row) for row in rows]
+    raise ValueError(f"Unknown row format: {row_format!r}")
+
+
+def _numeric(values, use_numpy):
+    if use_numpy:
+        return numpy.fromiter(values, dtype=float, count=len(values))
+    return array('d', values)
+
+
+def to_columns(rows, column_names, columnar="array"):
+    """Transpose a batch of row tuples into {column: values}.
+
+    `columnar` is "array" for the standard library `array` module or
+    "numpy" for NumPy arrays.
+    """
+    use_numpy = columnar == "numpy"
+    if use_numpy and numpy is None:
+        raise ImportError("columnar='numpy' requires NumPy to be installed")
+    if rows:
+        transposed = zip(*rows)
+    else:
+        transposed = ((),) * len(column_names)
+    batch = {}
+    for name, values in zip(column_names, transposed):
+        if name in NUMERIC_COLUMNS:
+            batch[name] = _numeric(values, use_numpy)
+        else:
+            batch[name] = [sys.intern(value) for value in values]
+    return batch
@@ -1,27 +1,33 @@
-import pymysql
 import csv
-import uuid
+import multiprocessing
+import os
+import time
 
-DB_NAME = "ALX_prodev"
+import backends
+import db_pool
+import ingest
+
+DB_NAME = db_pool.DB_NAME
+BATCH_SIZE = 1000
 
 def connect_db():
-    """Connect to the MySQL server (without specifying DB)."""
+    """Connect to the database server (without specifying DB).
+
+    The connection comes from the configured backend (see backends.py);
+    for MySQL it is pooled and close() returns it.
+    """
     try:
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",   
-            password="bw123bw",  
-            charset="utf8mb4",
-            cursorclass=pymysql.cursors.Cursor,
-            autocommit=True
-        )
-        return connection
+        return backends.current().connect_server()
     except Exception as e:
-        print(f"Error connecting to MySQL: {e}")
+        print(f"Error connecting to {backends.current().name}: {e}")
         return None
 
 def create_database(connection):
     """Create the ALX_prodev database if it does not exist."""
+    if backends.current().name == "sqlite":
+        # the database file is created when it is first opened
+        print(f"Database {DB_NAME} created or already exists")
+        return
     try:
         with connection.cursor() as cursor:
             cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
@@ -31,25 +37,52 @@ def create_database(connection):
 
 
 def connect_to_prodev():
-    """Connect to the ALX_prodev database."""
+    """Connect to the ALX_prodev database.
+
+    The connection comes from the configured backend (see backends.py);
+    for MySQL it is pooled and close() returns it.
+    """
     try:
-        connection = pymysql.connect(
-            host="localhost",
-            user="root",   
-            password="Sh123&*abc",
-            database=DB_NAME,
-            charset="utf8mb4",
-            cursorclass=pymysql.cursors.Cursor,
-            autocommit=True
-        )
-        return connection
+        return backends.current().connect()
     except Exception as e:
         print(f"Error connecting to {DB_NAME}: {e}")
         return None
 
 
+def _ensure_index(cursor, name, ddl):
+    """Run `ddl` unless user_data already has an index called `name`."""
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'user_data' "
+        "AND index_name = %s LIMIT 1",
+        (name,)
+    )
+    if not cursor.fetchone():
+        cursor.execute(ddl)
+
+
+def _ensure_column(cursor, name, ddl):
+    """Run `ddl` unless user_data already has a column called `name`."""
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = 'user_data' "
+        "AND column_name = %s LIMIT 1",
+        (name,)
+    )
+    if not cursor.fetchone():
+        cursor.execute(ddl)
+
+
 def create_table(connection):
     """Create the user_data table if it does not exist."""
+    backend = backends.current()
+    if backend.name == "sqlite":
+        try:
+            backend.create_table(connection)
+            print("Table user_data created successfully")
+        except Exception as e:
+            print(f"Error creating table: {e}")
+        return
     try:
         with connection.cursor() as cursor:
             cursor.execute("""
@@ -58,36 +91,156 @@ def create_table(connection):
                     name VARCHAR(255) NOT NULL,
                     email VARCHAR(255) NOT NULL,
                     age DECIMAL NOT NULL,
-                    INDEX (user_id)
+                    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+                    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+                        ON UPDATE CURRENT_TIMESTAMP(6),
+                    INDEX (user_id),
+                    UNIQUE INDEX uq_email (email),
+                    INDEX idx_age (age),
+                    INDEX idx_created (created_at, user_id),
+                    INDEX idx_updated (updated_at, user_id)
                 )
             """)
+            # tables created before these columns and indexes existed
+            _ensure_column(cursor, "created_at",
+                           "ALTER TABLE user_data ADD COLUMN created_at TIMESTAMP(6) "
+                           "NOT NULL DEFAULT CURRENT_TIMESTAMP(6)")
+            _ensure_column(cursor, "updated_at",
+                           "ALTER TABLE user_data ADD COLUMN updated_at TIMESTAMP(6) "
+                           "NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+                           "ON UPDATE CURRENT_TIMESTAMP(6)")
+            _ensure_index(cursor, "uq_email",
+                          "ALTER TABLE user_data ADD UNIQUE INDEX uq_email (email)")
+            _ensure_index(cursor, "idx_age",
+                          "ALTER TABLE user_data ADD INDEX idx_age (age)")
+            _ensure_index(cursor, "idx_created",
+                          "ALTER TABLE user_data ADD INDEX idx_created (created_at, user_id)")
+            _ensure_index(cursor, "idx_updated",
+                          "ALTER TABLE user_data ADD INDEX idx_updated (updated_at, user_id)")
             print("Table user_data created successfully")
     except Exception as e:
         print(f"Error creating table: {e}")
 
 
-def insert_data(connection, csv_file):
-    """Insert data from a CSV file into user_data if not already present."""
+INSERT_SQL = (
+    "INSERT IGNORE INTO user_data (user_id, name, email, age) "
+    "VALUES (%s, %s, %s, %s)"
+)
+
+
+def _insert_batch(connection, cursor, batch):
+    """Insert one batch in a single multi-row statement and commit it.
+
+    Rows whose email is already present are skipped by the unique index.
+    Returns the number of rows actually inserted.
+    """
+    inserted = cursor.executemany(INSERT_SQL, batch)
+    connection.commit()
+    return inserted or 0
+
+
+def _load_blocks(connection, blocks, header, batch_size):
+    """Parse CSV text blocks and insert the valid rows in committed batches.
+
+    Returns a (read, inserted, rejected) tuple of row counts.
+    """
+    read = inserted = rejected = 0
+    with connection.cursor() as cursor:
+        pending = []
+        for block in blocks:
+            rows, block_read = ingest.parse_block(block, header)
+            read += block_read
+            rejected += block_read - len(rows)
+            pending.extend(rows)
+            while len(pending) >= batch_size:
+                inserted += _insert_batch(connection, cursor, pending[:batch_size])
+                del pending[:batch_size]
+        if pending:
+            inserted += _insert_batch(connection, cursor, pending)
+    return read, inserted, rejected
+
+
+def _report(read, inserted, rejected, started):
+    elapsed = time.perf_counter() - started
+    rate = read / elapsed if elapsed else 0.0
+    print(f"Data inserted successfully: {inserted} new of {read} rows "
+          f"({rejected} rejected) in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+
+def insert_data(connection, csv_file, batch_size=BATCH_SIZE):
+    """Bulk load data from a CSV file into user_data, skipping known emails.
+
+    The file is read in large blocks that are parsed a column at a time
+    (see ingest.py); valid rows go to the server in chunks of `batch_size`,
+    each as one INSERT IGNORE committed on its own.
+    """
+    started = time.perf_counter()
+    autocommit = connection.get_autocommit()
     try:
-        with open(csv_file, newline='', encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            with connection.cursor() as cursor:
-                for row in reader:
-                    user_id = str(uuid.uuid4())
-                    name = row["name"]
-                    email = row["email"]
-                    age = row["age"]
-
-                    # Avoid inserting duplicates (based on email)
-                    cursor.execute("SELECT user_id FROM user_data WHERE email=%s", (email,))
-                    if cursor.fetchone():
-                        continue
-
-                    cursor.execute(
-                        "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
-                        (user_id, name, email, age)
-                    )
-            print("Data inserted successfully")
+        connection.autocommit(False)
+        header, [(start, end)] = _partition_csv(csv_file, 1)
+        blocks = ingest.read_blocks(csv_file, start, end)
+        counts = _load_blocks(connection, blocks, header, batch_size)
+        _report(*counts, started)
     except Exception as e:
+        connection.rollback()
         print(f"Error inserting data: {e}")
+    finally:
+        connection.autocommit(autocommit)
+
+
+def _partition_csv(csv_file, partitions):
+    """Split the data rows of `csv_file` into byte ranges on line boundaries.
+
+    Returns the header fields and a list of (start, end) offsets.
+    """
+    size = os.path.getsize(csv_file)
+    with open(csv_file, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        bounds = [f.tell()]
+        span = size - bounds[0]
+        for i in range(1, partitions):
+            # step back one byte so a target already on a line start is kept
+            f.seek(bounds[0] + span * i // partitions - 1)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return header, list(zip(bounds, bounds[1:]))
+
 
+def _ingest_partition(task):
+    """Worker: parse, validate and load one byte range of the CSV file."""
+    csv_file, header, start, end, batch_size = task
+    connection = connect_to_prodev()
+    if connection is None:
+        # fail the whole load rather than silently skip this byte range
+        raise ConnectionError(f"Could not connect to {DB_NAME}")
+    try:
+        connection.autocommit(False)
+        blocks = ingest.read_blocks(csv_file, start, end)
+        return _load_blocks(connection, blocks, header, batch_size)
+    finally:
+        connection.close()
+
+
+def insert_data_parallel(csv_file, workers=None, batch_size=BATCH_SIZE):
+    """Bulk load a large CSV file using one process and connection per partition.
+
+    The file is cut into `workers` byte ranges at line boundaries; each
+    worker parses, validates and inserts its own range, and progress is
+    printed as partitions finish.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    try:
+        header, ranges = _partition_csv(csv_file, workers)
+        tasks = [(csv_file, header, start, end, batch_size) for start, end in ranges]
+        totals = [0, 0, 0]
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            for done, counts in enumerate(pool.imap_unordered(_ingest_partition, tasks), 1):
+                totals = [total + count for total, count in zip(totals, counts)]
+                print(f"[{done}/{len(tasks)}] partitions loaded, {totals[0]} rows read")
+        _report(*totals, started)
+    except Exception as e:
+        print(f"Error inserting data: {e}")
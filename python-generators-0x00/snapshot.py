@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+"""
+Local columnar snapshot of user_data for repeated analytics.
+
+A snapshot is a directory with one file per column:
+
+    age.f64         raw float64 values, memory-mapped when read
+    user_id.zlib    zlib-compressed chunks of NUL-separated strings
+    name.zlib
+    email.zlib
+    meta.json       row count, chunk index and the high-water mark
+
+Rows are appended in (created_at, user_id) order, so refresh() only pulls
+rows inserted after the stored high-water mark. created_at is stamped when
+the INSERT runs, not when it commits, so rows younger than SETTLE_SECONDS
+are left for the next refresh: a batch that commits late with an earlier
+created_at is then still picked up instead of falling behind the mark.
+
+    python snapshot.py refresh [path]
+"""
+import datetime
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from itertools import chain, islice
+
+import pymysql
+
+import backends
+from query import COLUMNS, compile_filter, select_columns
+
+seed = __import__('seed')
+
+DEFAULT_PATH = "user_data.snapshot"
+CHUNK_ROWS = 65536
+NUMERIC_COLUMNS = ("age",)
+SETTLE_SECONDS = 1.0
+
+_SELECT = "SELECT user_id, name, email, age, created_at FROM user_data"
+_ORDER = " ORDER BY created_at, user_id"
+_AFTER = "(created_at > %s OR (created_at = %s AND user_id > %s))"
+
+
+def _settled(settle):
+    """A clause (and params) holding back rows created less than `settle` seconds ago."""
+    if backends.current().name == "sqlite":
+        # SQLite stamps created_at in UTC, from this machine's clock
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return "created_at < %s", [now - datetime.timedelta(seconds=settle)]
+    return "created_at < NOW(6) - INTERVAL %s MICROSECOND", [int(settle * 1_000_000)]
+
+
+class Snapshot:
+    """Read and incrementally refresh a snapshot directory."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+
+    def _file(self, column):
+        suffix = "f64" if column in NUMERIC_COLUMNS else "zlib"
+        return os.path.join(self.path, f"{column}.{suffix}")
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, "chunks": [], "high_water": None}
+
+    def _save_meta(self, meta):
+        target = os.path.join(self.path, "meta.json")
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(target + ".tmp", target)
+
+    def _truncate(self, meta):
+        """Drop bytes written by a refresh that died before saving meta.json."""
+        last = meta["chunks"][-1] if meta["chunks"] else None
+        for column in COLUMNS:
+            if column in NUMERIC_COLUMNS:
+                size = meta["rows"] * 8
+            else:
+                size = sum(last[column]) if last else 0
+            path = self._file(column)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def refresh(self, connection=None, chunk_rows=CHUNK_ROWS, settle=SETTLE_SECONDS):
+        """Append rows created since the high-water mark; returns rows added.
+
+        Rows created in the last `settle` seconds wait for a later refresh.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        meta = self.load_meta()
+        self._truncate(meta)
+        own_connection = connection is None
+        if own_connection:
+            connection = seed.connect_to_prodev()
+        added = 0
+        files = {column: open(self._file(column), "ab") for column in COLUMNS}
+        try:
+            with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+                where, params = _settled(settle)
+                if meta["high_water"] is not None:
+                    created_at, user_id = meta["high_water"]
+                    where += " AND " + _AFTER
+                    params += [created_at, created_at, user_id]
+                cursor.execute(f"{_SELECT} WHERE {where}{_ORDER}", params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    meta["chunks"].append(self._write_chunk(files, rows, meta["rows"]))
+                    meta["rows"] += len(rows)
+                    added += len(rows)
+                    user_id, created_at = rows[-1][0], rows[-1][4]
+                    meta["high_water"] = [
+                        created_at.isoformat(sep=" ", timespec="microseconds"), user_id]
+        finally:
+            for f in files.values():
+                f.close()
+            if own_connection:
+                connection.close()
+        self._save_meta(meta)
+        return added
+
+    @staticmethod
+    def _write_chunk(files, rows, start):
+        chunk = {"start": start, "rows": len(rows)}
+        for index, column in enumerate(COLUMNS):
+            values = [row[index] for row in rows]
+            f = files[column]
+            if column in NUMERIC_COLUMNS:
+                array("d", values).tofile(f)
+            else:
+                data = zlib.compress("\0".join(values).encode("utf-8"))
+                chunk[column] = [f.tell(), len(data)]
+                f.write(data)
+        return chunk
+
+    def chunks(self, columns=None):
+        """Yield one {column: values} dict per stored chunk.
+
+        Numeric columns are `array('d')` copied out of the memory map, text
+        columns are lists of str.
+        """
+        columns = select_columns(columns)
+        meta = self.load_meta()
+        if not meta["rows"]:
+            return
+        files = {column: open(self._file(column), "rb") for column in columns}
+        maps = {
+            column: mmap.mmap(files[column].fileno(), 0, access=mmap.ACCESS_READ)
+            for column in columns if column in NUMERIC_COLUMNS
+        }
+        try:
+            for chunk in meta["chunks"]:
+                data = {}
+                for column in columns:
+                    if column in maps:
+                        values = array("d")
+                        start = chunk["start"] * 8
+                        values.frombytes(maps[column][start:start + chunk["rows"] * 8])
+                    else:
+                        offset, length = chunk[column]
+                        files[column].seek(offset)
+                        text = zlib.decompress(files[column].read(length)).decode("utf-8")
+                        values = text.split("\0")
+                    data[column] = values
+                yield data
+        finally:
+            for mapped in maps.values():
+                mapped.close()
+            for f in files.values():
+                f.close()
+
+    def batches(self, batch_size, columns=None, where=None):
+        """Yield lists of row tuples for `columns`, filtered by `where`."""
+        names = select_columns(columns)
+        needed = names + [column for column, _, _ in where or () if column not in names]
+        predicate = compile_filter(where, needed)
+        rows = chain.from_iterable(
+            zip(*(data[column] for column in needed)) for data in self.chunks(needed)
+        )
+        if predicate:
+            rows = filter(predicate, rows)
+        if len(needed) > len(names):
+            rows = (row[:len(names)] for row in rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "refresh":
+        sys.exit(f"usage: {sys.argv[0]} refresh [path]")
+    snapshot = Snapshot(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH)
+    print(f"{snapshot.refresh()} rows added to {snapshot.path}")
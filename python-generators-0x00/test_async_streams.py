@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Unit tests for async_streams, with stand-in connections behind aiomysql's pool.
+"""
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+try:
+    import aiomysql.pool
+    import async_streams
+except ImportError:  # aiomysql or pymysql is not installed
+    async_streams = None
+
+ROWS = [(f"id-{i}", f"user {i}", f"user{i}@example.com", 30) for i in range(50)]
+
+
+class FakeReader:
+    """The stream state aiomysql checks before reusing a connection."""
+
+    eof_received = False
+
+    def at_eof(self):
+        return False
+
+    def exception(self):
+        return None
+
+
+class FakeCursor:
+    """A cursor that returns ROWS in fetchmany() batches."""
+
+    description = [("user_id",), ("name",), ("email",), ("age",)]
+
+    def __init__(self):
+        self.rows = list(ROWS)
+
+    async def execute(self, sql, params=None):
+        pass
+
+    async def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    async def close(self):
+        pass
+
+
+class FakeConnection:
+    """The parts of an aiomysql connection the pool and streams touch."""
+
+    opened = 0
+
+    def __init__(self):
+        FakeConnection.opened += 1
+        self._reader = FakeReader()
+        self.last_usage = time.monotonic()
+        self.closed = False
+
+    async def cursor(self, cursor_class=None):
+        return FakeCursor()
+
+    def get_transaction_status(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+    async def ensure_closed(self):
+        self.closed = True
+
+
+async def fake_connect(**kwargs):
+    return FakeConnection()
+
+
+async def first_rows(count):
+    """Read `count` users from a stream, then drop it mid-result."""
+    seen = []
+    async for user in async_streams.async_stream_users(prefetch=10):
+        seen.append(user)
+        if len(seen) == count:
+            break
+    return seen
+
+
+@unittest.skipIf(async_streams is None, "aiomysql is not installed")
+class TestEarlyClose(unittest.TestCase):
+    """Tests for streams abandoned before their result is read"""
+
+    def setUp(self):
+        FakeConnection.opened = 0
+        for patcher in (mock.patch.object(aiomysql.pool, "connect", fake_connect),
+                        mock.patch.object(async_streams, "POOL_SIZE", 1)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_waiting_streams_get_a_new_connection(self):
+        """A stream closed early lets the streams queued behind it run"""
+        async def run():
+            return await asyncio.wait_for(
+                asyncio.gather(*(first_rows(5) for _ in range(3))), timeout=5)
+
+        results = asyncio.run(run())
+        self.assertEqual([len(seen) for seen in results], [5, 5, 5])
+        self.assertEqual(results[0][0]["user_id"], "id-0")
+        # each abandoned stream closed its connection and the next opened one
+        self.assertEqual(FakeConnection.opened, 3)
+        self.assertEqual(async_streams._pools, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batch_sizer.AdaptiveBatchSize.
+"""
+import unittest
+
+from batch_sizer import AdaptiveBatchSize
+
+
+class TestAdaptiveBatchSize(unittest.TestCase):
+    """Tests for the next-size choice in AdaptiveBatchSize.observe"""
+
+    def test_memory_budget_applies_immediately(self):
+        """A batch over the budget shrinks straight to the budget, not by 2x steps"""
+        sizer = AdaptiveBatchSize(initial=10_000, memory_budget=1_000_000, maximum=100_000)
+        size = sizer.observe(10_000, 0.001, 1000)
+        self.assertEqual(size, 1000)
+        self.assertLessEqual(size * sizer.row_bytes, sizer.memory_budget)
+
+    def test_budget_holds_while_growing(self):
+        """Fast fetches grow the size at most 2x per batch and never past the budget"""
+        sizer = AdaptiveBatchSize(initial=100, memory_budget=1_000_000)
+        sizes = [sizer.observe(sizer.size, 0.0001, 1000) for _ in range(10)]
+        self.assertEqual(sizes[:3], [200, 400, 800])
+        self.assertEqual(max(sizes), 1000)
+
+    def test_slow_fetches_shrink_by_half(self):
+        """Timing-driven shrinking is still limited to 2x per batch"""
+        sizer = AdaptiveBatchSize(initial=1000, target_seconds=0.05)
+        self.assertEqual(sizer.observe(1000, 10.0, 100), 500)
+
+    def test_minimum_wins_over_budget(self):
+        """Rows larger than the whole budget still give `minimum` rows per batch"""
+        sizer = AdaptiveBatchSize(initial=1000, memory_budget=1000, minimum=10)
+        self.assertEqual(sizer.observe(1000, 0.001, 10_000), 10)
+
+    def test_empty_fetch_keeps_size(self):
+        """An empty fetch is counted but does not change the size"""
+        sizer = AdaptiveBatchSize(initial=500)
+        self.assertEqual(sizer.observe(0, 0.01, 0), 500)
+        self.assertEqual(sizer.metrics["batches"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
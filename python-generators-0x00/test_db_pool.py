@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Unit tests for db_pool.ConnectionPool, with stand-in connection objects.
+"""
+import threading
+import unittest
+
+try:
+    import db_pool
+except ImportError:  # pymysql is not installed
+    db_pool = None
+
+
+class FakeConnection:
+    """The parts of a pymysql connection the pool touches."""
+
+    def __init__(self):
+        self.open = True
+
+    def get_autocommit(self):
+        return True
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+def make_pool(**kwargs):
+    """A ConnectionPool that hands out FakeConnections."""
+    class FakePool(db_pool.ConnectionPool):
+        def _connect(self):
+            return FakeConnection()
+    return FakePool("test", **kwargs)
+
+
+@unittest.skipIf(db_pool is None, "pymysql is not installed")
+class TestConnectionPool(unittest.TestCase):
+    """Tests for ConnectionPool reuse and close()"""
+
+    def test_released_connection_is_reused(self):
+        """close() on a pooled connection hands the same connection back out"""
+        pool = make_pool()
+        first = pool.acquire()
+        raw = first._conn
+        first.close()
+        self.assertIs(pool.acquire()._conn, raw)
+        self.assertEqual(pool.stats()["created"], 1)
+
+    def test_release_after_close_closes_connection(self):
+        """A connection in use during close() is closed when it comes back"""
+        pool = make_pool()
+        conn = pool.acquire()
+        raw = conn._conn
+        pool.close()
+        conn.close()
+        self.assertFalse(raw.open)
+        stats = pool.stats()
+        self.assertEqual((stats["idle"], stats["open"]), (0, 0))
+
+    def test_close_closes_idle_connections(self):
+        """close() closes the connections waiting in the pool"""
+        pool = make_pool()
+        conn = pool.acquire()
+        raw = conn._conn
+        conn.close()
+        pool.close()
+        self.assertFalse(raw.open)
+
+    def test_acquire_after_close_raises(self):
+        """acquire() on a closed pool raises instead of opening a connection"""
+        pool = make_pool()
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+    def test_close_wakes_waiting_acquire(self):
+        """A caller waiting for a free connection fails once the pool is closed"""
+        pool = make_pool(max_size=1, timeout=5.0)
+        held = pool.acquire()
+        errors = []
+
+        def wait():
+            try:
+                pool.acquire()
+            except RuntimeError as e:
+                errors.append(e)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        while not pool.stats()["waits"]:
+            threading.Event().wait(0.01)
+        pool.close()
+        waiter.join(2.0)
+        self.assertEqual(len(errors), 1)
+        held.close()
+
+    def test_get_pool_replaces_closed_pool(self):
+        """get_pool() returns a fresh pool once the shared one was closed"""
+        pool = db_pool.get_pool("test_get_pool")
+        pool.close()
+        self.assertIsNot(db_pool.get_pool("test_get_pool"), pool)
+
+
+if __name__ == "__main__":
+    unittest.main()
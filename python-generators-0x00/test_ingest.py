@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ingest: the block parser against csv.reader, and uuid4_batch.
+"""
+import csv
+import unittest
+import uuid
+
+from ingest import _split_fields, parse_block, uuid4_batch
+
+HEADER = ["name", "email", "age"]
+
+BLOCKS = {
+    "quoted": '"Ann Lee","ann@example.com","31"\n"Bo Chan","bo@example.com","47"\n',
+    "unquoted": "Ann Lee,ann@example.com,31\nBo Chan,bo@example.com,47\n",
+    "no trailing newline": "Ann Lee,ann@example.com,31\nBo Chan,bo@example.com,47",
+    "embedded comma": '"Lee, Ann","ann@example.com","31"\n"Bo Chan","bo@example.com","47"\n',
+    "escaped quote": '"Ann ""Annie"" Lee","ann@example.com","31"\n'
+                     '"Bo Chan","bo@example.com","47"\n',
+    "mixed quoting": 'Ann Lee,"ann@example.com",31\nBo Chan,bo@example.com,47\n',
+    "ragged": "Ann Lee,ann@example.com,31\nBo Chan,bo@example.com\n"
+              "Cy Diaz,cy@example.com,22,extra\nDee Fox,dee@example.com,58\n",
+    "invalid records": "Ann Lee,ann@example.com,31\n ,bo@example.com,47\n"
+                       "Cy Diaz,cy.example.com,22\nDee Fox,dee@example.com,-1\n"
+                       "Eve Gray,eve@example.com,old\n",
+}
+
+
+def csv_rows(text):
+    """The records of `text` as csv.reader sees them."""
+    return [row for row in csv.reader(text.splitlines()) if row]
+
+
+def expected_rows(text):
+    """What parse_block should return for `text`, minus the user_ids."""
+    rows = []
+    for row in csv_rows(text):
+        if len(row) != len(HEADER):
+            continue
+        name, email, age = (value.strip() for value in row)
+        try:
+            valid_age = float(row[2]) >= 0
+        except ValueError:
+            valid_age = False
+        if name and "@" in email and valid_age:
+            rows.append((name, email, row[2]))
+    return rows
+
+
+class TestSplitFields(unittest.TestCase):
+    """Tests for the fast path of the block parser"""
+
+    def test_matches_csv_reader(self):
+        """Fields split on the fast path are the ones csv.reader finds"""
+        for label, text in BLOCKS.items():
+            with self.subTest(label):
+                fields = _split_fields(text, len(HEADER))
+                if fields is not None:
+                    self.assertEqual(fields, [value for row in csv_rows(text)
+                                              for value in row])
+
+    def test_regular_blocks_take_the_fast_path(self):
+        """Blocks quoted the same way on every line are split without csv"""
+        for label in ("quoted", "unquoted", "no trailing newline", "embedded comma",
+                      "invalid records"):
+            with self.subTest(label):
+                self.assertIsNotNone(_split_fields(BLOCKS[label], len(HEADER)))
+
+    def test_irregular_blocks_fall_back(self):
+        """Escaped quotes, mixed quoting and ragged lines are left to csv"""
+        for label in ("escaped quote", "mixed quoting", "ragged"):
+            with self.subTest(label):
+                self.assertIsNone(_split_fields(BLOCKS[label], len(HEADER)))
+
+
+class TestParseBlock(unittest.TestCase):
+    """Tests for parse_block"""
+
+    def test_matches_csv_reader(self):
+        """parse_block keeps the same valid records csv.reader would"""
+        for label, text in BLOCKS.items():
+            with self.subTest(label):
+                rows, read = parse_block(text, HEADER)
+                self.assertEqual([row[1:] for row in rows], expected_rows(text))
+                self.assertEqual(read, len(csv_rows(text)))
+
+    def test_crlf_line_endings(self):
+        """Windows line endings parse like Unix ones"""
+        text = BLOCKS["quoted"]
+        rows, read = parse_block(text.replace("\n", "\r\n"), HEADER)
+        self.assertEqual([row[1:] for row in rows], expected_rows(text))
+        self.assertEqual(read, 2)
+
+    def test_header_order(self):
+        """Columns are picked by header name, not position"""
+        rows, _ = parse_block("31,Ann Lee,ann@example.com\n", ["age", "name", "email"])
+        self.assertEqual(rows[0][1:], ("Ann Lee", "ann@example.com", "31"))
+
+
+class TestUuid4Batch(unittest.TestCase):
+    """Tests for uuid4_batch"""
+
+    def test_version_and_variant(self):
+        """Every UUID is a distinct RFC 4122 version 4 UUID"""
+        ids = uuid4_batch(1000)
+        self.assertEqual(len(ids), 1000)
+        self.assertEqual(len(set(ids)), 1000)
+        for value in ids:
+            parsed = uuid.UUID(value)
+            self.assertEqual(str(parsed), value)
+            self.assertEqual(parsed.version, 4)
+            self.assertEqual(parsed.variant, uuid.RFC_4122)
+            self.assertEqual(value[14], "4")
+            self.assertIn(value[19], "89ab")
+
+    def test_empty(self):
+        """A batch of zero UUIDs is an empty list"""
+        self.assertEqual(uuid4_batch(0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the partition scan consumer.
+"""
+import multiprocessing
+import os
+import unittest
+
+try:
+    import partition
+except ImportError:  # pymysql is not installed
+    partition = None
+
+
+def _finish(queue):
+    queue.put((0, "rows", [("a", 1)]))
+    queue.put((0, "done", None))
+
+
+def _die(queue):
+    queue.put((0, "rows", [("a", 1)]))
+    queue.close()
+    queue.join_thread()
+    os._exit(9)  # as if killed before reporting "done"
+
+
+def _run(target):
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=target, args=(queue,), daemon=True)
+    worker.start()
+    return queue, worker
+
+
+@unittest.skipIf(partition is None, "pymysql is not installed")
+class TestDrain(unittest.TestCase):
+    """Tests for partition._drain"""
+
+    def setUp(self):
+        self.addCleanup(setattr, partition, "POLL_SECONDS", partition.POLL_SECONDS)
+        partition.POLL_SECONDS = 0.2
+
+    def test_yields_rows_until_done(self):
+        """Rows are yielded as dicts until the worker reports done"""
+        queue, worker = _run(_finish)
+        rows = list(partition._drain(queue, {0: worker}, ["name", "age"]))
+        worker.join()
+        self.assertEqual(rows, [{"name": "a", "age": 1}])
+
+    def test_dead_worker_raises(self):
+        """A worker that exits without reporting done fails the scan instead of hanging"""
+        queue, worker = _run(_die)
+        rows = []
+        with self.assertRaisesRegex(RuntimeError, "exited with code 9"):
+            for row in partition._drain(queue, {0: worker}, ["name", "age"]):
+                rows.append(row)
+        self.assertEqual(len(rows), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
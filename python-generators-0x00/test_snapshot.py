@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for snapshot.Snapshot.refresh, against a local SQLite file.
+"""
+import datetime
+import os
+import tempfile
+import time
+import unittest
+import uuid
+
+try:
+    import backends
+    import snapshot
+except ImportError:  # pymysql is not installed
+    snapshot = None
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+@unittest.skipIf(snapshot is None, "pymysql is not installed")
+class TestRefresh(unittest.TestCase):
+    """refresh() only moves the high-water mark past settled rows"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(backends.use, backends.current())
+        self.backend = backends.use(
+            backends.SQLiteBackend(os.path.join(tmp.name, "users.sqlite3")))
+        self.conn = self.backend.connect()
+        self.addCleanup(self.conn.close)
+        self.backend.create_table(self.conn)
+        self.snapshot = snapshot.Snapshot(os.path.join(tmp.name, "snap"))
+
+    def insert(self, created_at):
+        user_id = str(uuid.uuid4())
+        self.conn.cursor().execute(
+            "INSERT INTO user_data (user_id, name, email, age, created_at) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (user_id, "n", f"{user_id}@example.com", 30, created_at))
+
+    def test_late_commit_with_earlier_created_at_is_kept(self):
+        """A row committed after a refresh, stamped before a newer row, is not skipped"""
+        self.insert(utcnow() - datetime.timedelta(seconds=60))
+        self.insert(utcnow())  # too young to be taken yet
+        self.assertEqual(self.snapshot.refresh(settle=0.5), 1)
+        # a batch that ran earlier commits now
+        self.insert(utcnow() - datetime.timedelta(seconds=0.2))
+        time.sleep(0.6)
+        self.assertEqual(self.snapshot.refresh(settle=0.5), 2)
+        self.assertEqual(self.snapshot.load_meta()["rows"], 3)
+
+    def test_refresh_is_incremental(self):
+        """A second refresh with nothing new adds no rows"""
+        for _ in range(3):
+            self.insert(utcnow() - datetime.timedelta(seconds=10))
+        self.assertEqual(self.snapshot.refresh(settle=0), 3)
+        self.assertEqual(self.snapshot.refresh(settle=0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
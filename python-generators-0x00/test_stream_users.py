@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Memory test for 0-stream_users.stream_users, against a local SQLite file.
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROWS = 300_000
+# allowed VmHWM growth between the first rows and the end of the table; the
+# whole table held as row dicts would take well over 100 MiB
+MAX_GROWTH_KB = 16 * 1024
+
+# Runs in a fresh interpreter so the peak RSS reflects streaming only.
+# SQLite's own page cache and mmap window are kept small: they grow with
+# the file, not with what the generator holds.
+CHILD = """
+import itertools, sys
+sys.path.insert(0, {here!r})
+import backends
+backends.use(backends.SQLiteBackend({path!r}, cache_kb=1024, mmap_bytes=0))
+stream_users = __import__('0-stream_users').stream_users
+
+def peak_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+rows = stream_users()
+count = sum(1 for _ in itertools.islice(rows, 1000))
+warm = peak_kb()
+count += sum(1 for _ in rows)
+print(count, warm, peak_kb())
+"""
+
+
+def seed_sqlite(path, rows):
+    """Create user_data at `path` through SQLiteBackend with `rows` users."""
+    import backends
+    backend = backends.SQLiteBackend(path)
+    conn = backend.connect()
+    try:
+        backend.create_table(conn)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.executemany(
+            "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
+            ((str(uuid.uuid4()), f"User {i}", f"user{i}@example.com", 18 + i % 60)
+             for i in range(rows)))
+        cursor.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+@unittest.skipUnless(importlib.util.find_spec("pymysql"), "pymysql is not installed")
+@unittest.skipUnless(os.path.exists("/proc/self/status"), "needs /proc (Linux)")
+class TestStreamUsersMemory(unittest.TestCase):
+    """Peak RSS while streaming the whole table stays flat"""
+
+    def test_peak_rss_is_flat(self):
+        """Iterating every row grows peak RSS by far less than the table size"""
+        sys.path.insert(0, HERE)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.sqlite3")
+            seed_sqlite(path, ROWS)
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD.format(here=HERE, path=path)],
+                capture_output=True, text=True, check=True).stdout
+        count, warm_kb, peak_kb = map(int, output.split()[-3:])
+        self.assertEqual(count, ROWS)
+        self.assertLess(peak_kb - warm_kb, MAX_GROWTH_KB)
+
+
+if __name__ == "__main__":
+    unittest.main()